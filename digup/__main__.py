@@ -1,122 +1,450 @@
-import random
 import shutil
 import signal
 import subprocess
 import sys
-from itertools import combinations as comb
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 from os.path import join, dirname, abspath, isfile
 from pathlib import Path
+from queue import SimpleQueue
+from threading import Event, Lock, Thread
 
+import numpy as np
 from rich.progress import Progress
 
-from scripts import read_lines, input_csv, b_name
-from scripts import read_trace, construct_trace, dig_p
+from scripts import read_lines, input_csv, b_name, parse_dig_result
+from scripts import read_trace, trace_text, dig_p
 from scripts.env import *
+from scripts.memory import Admission, MEM_CODE, capped, oom
+from . import profile
+from .cache import Cache
+from .columns import analyze, restate
+from .plan import Planner
+from .refresh import split, partitions
+from .sample import infer
+from .worker import Worker, shutdown
+from .workqueue import WorkQueue, owner, POLL
 
+ROOT = dirname(dirname(abspath(__file__)))
+OPTS = {'-j': ('jobs', N_JOBS),  # DigUp options: flag → (key, default)
+        '-w': ('warm', WARM),
+        '-p': ('profile_to', PROFILE),
+        '-q': ('queue', QUEUE)}
 
-def __calc_diff(n, combinations):
-    """Combinations with symmetric difference > n."""
-    result = []
-    for c in combinations:
-        diff = lambda r: set(c).symmetric_difference(set(r))
-        if not next((r for r in result if len(diff(r)) < n), None):
-            result.append(c)
-    return result
+__live, __lock, __stop = set(), Lock(), Event()
+__gate, __fails = Admission(), Counter()  # memory admission, stops
+__stream = [None if STREAM else False]  # Dig reads stdin; None=unknown
 
 
-def __run_dig(in_file, *args):
-    """Run Dig with timeout."""
-    return subprocess.run(
-        ['python3', '-O', 'dig/src/dig.py', in_file, *args],
-        cwd=dirname(dirname(abspath(__file__))),
-        timeout=SPROC_TO, capture_output=True, text=True).stdout
+def __run_dig(in_file, *args, text=None):
+    """Run Dig with timeout and memory cap; text, if any, is passed
+    on stdin. Waits to start while memory is low; does not start once
+    DigUp is stopping, and returns no output then.
 
+    Raises:
+        TimeoutExpired: if Dig does not complete in time.
+        MemoryError: if Dig runs out of memory.
+    """
+    with __gate:
+        if __stop.is_set():
+            return ''
+        with subprocess.Popen(
+                capped(['python3', '-O', 'dig/src/dig.py', in_file, *args]),
+                cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                stdin=None if text is None else subprocess.PIPE,
+                text=True) as proc:
+            with __lock:
+                __live.add(proc)
+            try:
+                out, err = proc.communicate(text, timeout=SPROC_TO)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+                raise
+            finally:
+                with __lock:
+                    __live.discard(proc)
+    if not __stop.is_set() and oom(proc.returncode, err):
+        raise MemoryError(in_file)
+    return out
+
+
+def __halt(*_):
+    """Terminate running Dig processes and exit."""
+    __stop.set()
+    with __lock:
+        for proc in __live:
+            proc.kill()
+    shutdown()
+    profile.save()
+    sys.exit(129)
+
+
+def __fail(ix, status):
+    """Record a partition stopped by a timeout or out of memory."""
+    profile.status(ix, status)
+    with __lock:
+        __fails[status] += 1
+    return ''
+
+
+def __report():
+    """Print the numbers of partitions stopped, by cause."""
+    if __fails:
+        print(f"{__fails['timeout']} partitions timed out, "
+              f"{__fails['memory']} ran out of memory", file=sys.stderr)
+
+
+def __run_part(ix, name, args, trace, variables, worker=None, cache=None):
+    """Run Dig on one partition of the trace, unless cached."""
+    vars_ = [v for i, v in enumerate(variables) if i in ix]
+    values, opt = trace[:, ix], [f'-rows {N_ROWS}'] if N_ROWS else []
+    profile.begin(ix, vars_)
+    key = cache.key(vars_, values, [*args, *opt]) if cache else None
+    if key and (out := cache.get(key)) is not None:
+        profile.status(ix, 'cached')
+        profile.finish(ix, out)
+        return out
+    run = lambda v: __dig_part(ix, name, args, v, vars_, worker)
+    if out := (infer(run, vars_, values, N_ROWS)
+               if 0 < N_ROWS < len(values) else run(values)):
+        cache.put(key, out) if key else None
+    profile.finish(ix, out or '')
+    return out
+
+
+def __dig_part(ix, name, args, values, vars_, worker):
+    """Run Dig on partition values.
+
+    The partition is passed to Dig on stdin. Until a streamed run has
+    output, a streamed run without output runs again on a temporary
+    file: if that has output, Dig cannot read streams and later
+    partitions are passed as files, else streams are known to work.
+    """
+    if worker:
+        try:
+            with profile.phase(ix, 'run'), __gate:
+                return worker.run((vars_, values), args)
+        except subprocess.TimeoutExpired:
+            return __fail(ix, 'timeout')
+        except MemoryError:
+            return __fail(ix, 'memory')
+    with profile.phase(ix, 'write'):
+        text, tmp_in = trace_text(vars_, values), None
+    try:
+        if __stream[0] is not False:
+            with profile.phase(ix, 'run'):
+                out = __run_dig('/dev/stdin', *args, text=text)
+            if out.strip() or __stream[0]:
+                __stream[0] = True
+                return out
+        f_names = f'{name}-' + '-'.join(map(str, ix)) + '.csv'
+        tmp_in = join(TMP, f_names)
+        with profile.phase(ix, 'write'), open(tmp_in, 'w') as fp:
+            fp.write(text)
+        with profile.phase(ix, 'run'):
+            out = __run_dig(tmp_in, *args)
+        if __stream[0] is None:
+            __stream[0] = not out.strip()
+        return out
+    except subprocess.TimeoutExpired:
+        return __fail(ix, 'timeout')
+    except MemoryError:
+        return __fail(ix, 'memory')
+    finally:
+        try:
+            os.remove(tmp_in) if tmp_in else None
+        except:
+            pass
 
-def run_parts(indices, name, args, trace, variables):
+
+def run_parts(indices, name, args, trace, variables,
+              jobs=1, warm=False, cache=None):
     """A generator for invariant inference over partitions.
 
+    With jobs > 1, partitions are dispatched to a pool of
+    workers and results are yielded in order of completion,
+    as (indices, Dig output) pairs. Indices are taken one at a
+    time, as workers become free.
+
     Arguments:
-        indices: list of indices to analyze
+        indices: iterable of indices to analyze
         name: benchmark name
         args: Dig arguments
         trace: input data
         variables: list of variables
+        jobs: number of concurrent Dig processes
+        warm: run Dig in persistent worker processes
+        cache: result cache, or None
     """
-    for ix in indices:
-        vars_ = [v for i, v in enumerate(variables) if i in ix]
-        f_names = f'{name}-' + '-'.join(map(str, ix)) + '.csv'
-        tmp_in = join(TMP, f_names)
-        construct_trace(vars_, trace[:, ix], fn=tmp_in)
+    workers = SimpleQueue()
+    for _ in range(max(jobs, 1) if warm else 0):
+        workers.put(Worker())
+
+    def task(ix):
+        w = workers.get() if warm else None
         try:
-            yield __run_dig(tmp_in, *args)
-        except subprocess.TimeoutExpired:
-            yield ''
+            return __run_part(ix, name, args, trace, variables, w, cache)
+        finally:
+            workers.put(w) if w else None
+
+    pool = ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        if not pool:
+            yield from ((ix, task(ix)) for ix in indices)
+        else:
+            pending = iter(indices)
+            futures = {pool.submit(task, ix): ix
+                       for ix in islice(pending, jobs)}
+            while futures:
+                for future in wait(futures, return_when=FIRST_COMPLETED)[0]:
+                    yield futures.pop(future), future.result()
+                    if (ix := next(pending, None)) is not None:
+                        futures[pool.submit(task, ix)] = ix
+    finally:
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+        while not workers.empty():
+            workers.get().close()
+
+
+def work(path, jobs=1, warm=False):
+    """Run partitions of a work queue until none are left open.
+
+    Leases of claimed partitions are renewed every LEASE/3 seconds.
+    Partitions stopped by a halt are not completed; their leases
+    expire and another worker claims them again.
+
+    Arguments:
+        path: work-queue directory
+        jobs: number of concurrent Dig processes
+        warm: run Dig in persistent worker processes
+    """
+    q, who, runs = WorkQueue(path), owner(), {}
+    cache, lock, idle = Cache() if CACHE else None, Lock(), Event()
+
+    def load(run):
+        with lock:
+            if run not in runs:
+                name, fn, args, keep = q.run(run)
+                trace, vars_, _ = read_trace(fn)
+                runs[run] = name, args, trace[:, keep], \
+                    [vars_[i] for i in keep]
+            return runs[run]
+
+    def loop():
+        worker = Worker() if warm else None
         try:
-            os.remove(tmp_in)
-        except:
-            pass
+            while not __stop.is_set():
+                if (claim := q.claim(who)) is None:
+                    if not q.open():
+                        return
+                    time.sleep(POLL)
+                    continue
+                run, ix = claim
+                out = __run_part(ix, *load(run), worker, cache)
+                if not __stop.is_set():
+                    q.complete(run, ix, out)
+        finally:
+            worker.close() if worker else None
+
+    def renew():
+        while not idle.wait(q.lease / 3):
+            q.renew(who)
+
+    Thread(target=renew, daemon=True).start()
+    Path(TMP).mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        [f.result() for f in [pool.submit(loop) for _ in range(jobs)]]
+    idle.set()
+
+
+def queued(path, parts, fp, args, keep, jobs=1, warm=False):
+    """A generator for invariant inference over a work queue.
+
+    Adds the partitions to the queue at path, unless they are there
+    from an earlier run, and runs them on `jobs` local workers (0 for
+    none), alongside workers of other processes. Yields (indices, Dig
+    output) pairs in order of completion, including partitions done
+    by earlier runs; failed partitions have no output.
+
+    Arguments:
+        path: work-queue directory
+        parts: partitions, as column indices of the kept columns
+        fp: path to input trace
+        args: Dig arguments
+        keep: indices of the kept columns of the trace
+        jobs: number of concurrent local Dig processes
+        warm: run Dig in persistent worker processes
+    """
+    q = WorkQueue(path)
+    run = q.submit(fp, args, keep, parts)
+    if jobs > 0:
+        Thread(target=work, args=(path, jobs, warm), daemon=True).start()
+    yield from q.results(run)
 
 
 def run_one(fp, *args):
-    """Run Dig on specified file."""
+    """Run Dig on specified file; exits with MEM_CODE if Dig runs
+    out of memory."""
     try:
         print(__run_dig(fp, *args))
     except subprocess.TimeoutExpired:
         pass
+    except MemoryError:
+        print('Dig ran out of memory', file=sys.stderr)
+        sys.exit(MEM_CODE)
 
 
-def partition(trace, vars_, fp, *args):
+def partition(trace, vars_, fp, *args, jobs=1, warm=False, profile_to='',
+              queue=''):
     """Modified Dig run that partitions the input trace.
 
     If number of variables is low (<= 6), runs regular Dig.
     Otherwise, sample at most MAX_VARS and analyze a subset
-    of the traces.
+    of the traces. Partitions run by expected yield, as long
+    as they fit the time budget TO. Columns implied by other
+    columns are reported and dropped before partitioning, and
+    invariants are restated for dropped duplicates. With a
+    work queue, all planned partitions are queued, and any worker
+    sharing the queue directory may run them.
 
     Arguments:
         trace: traced values
         vars_: list of variables names
         fp: path to input trace
         *args: Dig arguments
+        jobs: number of concurrent Dig processes
+        warm: run Dig in persistent worker processes
+        profile_to: file to save a per-partition profile to
+        queue: work-queue directory, or empty to run locally
     """
-    history, recount = {}, 1
+    history, recount, start = {}, 1, time.time()
     flt = lambda x: x not in history
-    ids = __calc_diff(4, list(comb(range(len(vrs)), PICK_N)))
-    random.shuffle(ids)
-    Path(TMP).mkdir(parents=True, exist_ok=True)
-    to_handler = lambda _, __: sys.exit(129)
-    signal.signal(signal.SIGALRM, to_handler)
+    signal.signal(signal.SIGALRM, __halt)
     signal.alarm(TOTAL_TO)
+    cache = Cache() if CACHE and not queue else None  # queue: in work()
+    keep, inv, same = analyze(trace, vars_, PRE > 1) if PRE \
+        else (range(len(vars_)), [], {})
+    if inv:
+        history.update(dict([(k, 1) for k in inv]))
+        print('#. ' + ('\n#. '.join(inv)), flush=True)
+    if len(keep) < len(vars_):
+        trace, vars_ = trace[:, keep], [vars_[i] for i in keep]
+    if not vars_:
+        return
+    k = len(vars_) if len(vars_) <= 6 else PICK_N
+    ids = Planner(trace, k, 4, N_PARTS, TOTAL_TO, jobs, start=start)
+    profile.enable(profile_to) if profile_to else None
+    Path(TMP).mkdir(parents=True, exist_ok=True)
     with Progress() as progress:
         task = progress.add_task('', total=len(ids))
-        for item in run_parts(ids, b_name(fp), args, trace, vars_):
-            if isinstance(item, str):
+        if queue:
+            ids.ran, ids.todo = ids.todo, []
+            parts = queued(queue, ids.ran, fp, args, keep, jobs, warm)
+        else:
+            parts = run_parts(
+                ids, b_name(fp), args, trace, vars_, jobs, warm, cache)
+        for ix, item in parts:
+            ids.done(ix)
+            with profile.phase(ix, 'parse'):
                 item = ('' if item is None else item).split('\n')
-            if inv := list(filter(flt, dig_p(item))):
-                history.update(dict([(k, 1) for k in inv]))
-                print('#. ' + ('\n#. '.join(inv)))
-            progress.update(task, advance=1)
+                inv = restate(dig_p(item), same)
+                new = list(filter(flt, inv))
+            profile.count(ix, len(inv), len(new))
+            if new:
+                history.update(dict([(k, 1) for k in new]))
+                print('#. ' + ('\n#. '.join(new)), flush=True)
+            progress.update(task, advance=1, total=len(ids))
+    if ids.todo:
+        print(f'{len(ids.todo)} partitions do not fit the time budget',
+              file=sys.stderr)
+    __report()
     shutil.rmtree(TMP, ignore_errors=True)
+    profile.save()
+    print(cache, file=sys.stderr) if cache else None
+
+
+def refresh(fp, new, *args, jobs=1, warm=False, profile_to=''):
+    """Update a Dig or DigUp result for rows appended to its trace.
+
+    Arguments:
+        fp: path to the result
+        new: path to a trace of the appended rows
+        *args: Dig arguments
+        jobs: number of concurrent Dig processes
+        warm: run Dig in persistent worker processes
+        profile_to: file to save a per-partition profile to
+    """
+    rows, vars_, loc = read_trace(new)
+    kept, broken = split(parse_dig_result(fp), vars_, rows)
+    ids, found = partitions(broken, vars_), []
+    if ids:
+        trace, old_vars, _ = read_trace(input_csv(b_name(fp)))
+        if old_vars != vars_:
+            raise ValueError(f'{new} does not have the variables of {fp}')
+        cache = Cache() if CACHE else None
+        profile.enable(profile_to) if profile_to else None
+        Path(TMP).mkdir(parents=True, exist_ok=True)
+        signal.signal(signal.SIGALRM, __halt)
+        signal.alarm(TOTAL_TO)
+        parts = run_parts(ids, b_name(fp), args, np.concatenate(
+            [trace, rows]), vars_, jobs, warm, cache)
+        for ix, out in parts:
+            found += dig_p(('' if out is None else out).split('\n'))
+        __report()
+        shutil.rmtree(TMP, ignore_errors=True)
+        profile.save()
+    invs = list(dict.fromkeys(kept + found))
+    write(fp, loc, invs)
+    print(f'{len(kept)} kept, {len(broken)} falsified, {len(ids)} '
+          f'partitions, {len(invs) - len(kept)} new', file=sys.stderr)
+
+
+def write(fp, loc, invs):
+    """Write invariants in sorted result format."""
+    lines = [f'{1 + n}. {x}' for n, x in enumerate(sorted(invs, key=len))]
+    head = f'{loc} ({len(lines)} invs):'
+    with open(fp, 'w') as f:
+        f.write('\n'.join([head] + lines))
 
 
 def reformat(fp):
     """Rewrite stream result to sorted format."""
     if isfile(fp):
         loc = read_trace(input_csv(b_name(fp)))[-1]
-        if lines := read_lines(fp):
-            values = sorted(dig_p(lines), key=len)
-            lines = [f'{1 + n}. {x}' for n, x in enumerate(values)]
-        head = f'{loc} ({len(lines)} invs):'
-        data = '\n'.join([head] + lines)
-        with open(fp, 'w') as f:
-            f.write(data)
+        write(fp, loc, dig_p(read_lines(fp)))
+
+
+def cli_opts(argv):
+    """Separate DigUp options from the pass-through Dig arguments."""
+    opts = dict(OPTS.values())
+    rest, items = [], iter(argv)
+    for x in items:
+        if x in OPTS:
+            key, default = OPTS[x]
+            opts[key] = True if isinstance(default, bool) \
+                else type(default)(next(items))
+        else:
+            rest.append(x)
+    return opts, rest
 
 
 if __name__ == "__main__":
-    input_file, *dig_args = sys.argv[1:]
+    cfg, argv = cli_opts(sys.argv[1:])
+    queue, (input_file, *dig_args) = cfg.pop('queue'), argv or ['']
+    if not input_file and queue:
+        work(queue, cfg['jobs'], cfg['warm'])
     if input_file.endswith('.csv'):
         trc, vrs, _ = read_trace(input_file)
         a = lambda: run_one(input_file, *dig_args)
-        b = lambda: partition(trc, vrs, input_file, *dig_args)
+        b = lambda: partition(
+            trc, vrs, input_file, *dig_args, **cfg, queue=queue)
         a() if len(vrs) <= 6 else b()
-    if input_file.endswith('.digup'):
+    if input_file.endswith(('.dig', '.digup')) and dig_args and \
+            dig_args[0].endswith('.csv'):
+        refresh(input_file, *dig_args, **cfg)
+    elif input_file.endswith('.digup'):
         reformat(input_file)
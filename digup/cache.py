@@ -0,0 +1,115 @@
+"""Content-addressed cache of per-partition Dig results.
+
+Entries are keyed by a hash of the partition data, variable names and
+Dig arguments, and stored under a directory per Dig version, so that
+updating Dig invalidates earlier results. The cache is bounded in size
+and evicts least recently used entries first.
+
+Usage:
+    python -m digup.cache        (drop entries of other Dig versions)
+    python -m digup.cache all    (drop all entries)
+"""
+import hashlib
+import shutil
+import sys
+from os.path import join, dirname, abspath, isdir, getsize
+from pathlib import Path
+from threading import Lock
+
+import numpy as np
+
+from scripts.env import *
+
+ROOT = dirname(dirname(abspath(__file__)))
+
+
+def dig_version():
+    """Identify the Dig build: `DIG_V`, or a hash of the Dig sources."""
+    if version := ENV.get('DIG_V'):
+        return version
+    h = hashlib.sha256()
+    for f in sorted(Path(ROOT, 'dig', 'src').rglob('*.py')):
+        h.update(f.read_bytes())
+    return h.hexdigest()[:12]
+
+
+class Cache:
+    """Size-bounded LRU store of Dig outputs on disk.
+
+    Arguments:
+        root: cache directory
+        limit: size bound in MB
+        version: Dig version identifier
+    """
+
+    def __init__(self, root=CACHE, limit=CACHE_MB, version=None):
+        self.dir = join(root, version or dig_version())
+        self.root, self.limit = root, limit * 1024 ** 2
+        self.hits = self.misses = self.size = 0
+        self.lock = Lock()
+        Path(self.dir).mkdir(parents=True, exist_ok=True)
+        self.size = sum(f.stat().st_size for f in self.__entries())
+
+    def __entries(self):
+        return [f for f in Path(self.root).glob('*/*') if f.is_file()]
+
+    @staticmethod
+    def key(vars_, values, args):
+        """Hash of a partition and Dig arguments."""
+        data = np.ascontiguousarray(values)
+        h = hashlib.sha256()
+        for part in ['\0'.join(vars_), '\0'.join(args),
+                     str(data.dtype), str(data.shape)]:
+            h.update(part.encode() + b'\1')
+        h.update(data.tobytes())
+        return h.hexdigest()
+
+    def get(self, key):
+        """Cached output for key, or None."""
+        fp = join(self.dir, key)
+        try:
+            with open(fp, 'r') as f:
+                out = f.read()
+            os.utime(fp)
+        except OSError:
+            out = None
+        with self.lock:
+            self.hits += out is not None
+            self.misses += out is None
+        return out
+
+    def put(self, key, out):
+        """Store output for key, then evict down to the size bound."""
+        fp, tmp = join(self.dir, key), join(self.dir, f'.{key}')
+        with open(tmp, 'w') as f:
+            f.write(out)
+        os.replace(tmp, fp)
+        with self.lock:
+            self.size += getsize(fp)
+            if self.size > self.limit:
+                self.__evict()
+
+    def __evict(self):
+        entries = [(f.stat().st_mtime, f) for f in self.__entries()]
+        self.size = sum(f.stat().st_size for _, f in entries)
+        for _, f in sorted(entries):
+            if self.size <= self.limit:
+                break
+            self.size -= f.stat().st_size
+            f.unlink(missing_ok=True)
+
+    def __str__(self):
+        return f'cache: {self.hits} hits, {self.misses} misses'
+
+
+def prune(everything=False):
+    """Remove cache entries of other Dig versions (or all)."""
+    keep = None if everything else dig_version()
+    if isdir(CACHE):
+        for d in Path(CACHE).iterdir():
+            if d.is_dir() and d.name != keep:
+                shutil.rmtree(d, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    prune(sys.argv[1:] == ['all'])
@@ -0,0 +1,132 @@
+"""Column pre-analysis for DigUp.
+
+Before partitioning, columns that are constant or duplicates of another
+column are found with NumPy. Their equalities are invariants of the
+trace, and the columns are dropped, so that partitions are planned over
+fewer variables. Invariants found for a column are restated for its
+duplicates, so the result names the dropped columns as before.
+
+Optionally, columns that are exact affine combinations of other columns
+are dropped too. Their invariants are implied by the equalities and the
+invariants of the kept columns, but not restated, e.g., bounds of the
+dropped column are not reported. Affine relations are found only for
+integer traces: a column is fitted on the columns kept before it by
+least squares on a sample of the rows, and the rounded rational
+relation is checked on all rows.
+"""
+import re
+from fractions import Fraction
+from functools import reduce
+from math import gcd, lcm
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from scripts.evaluate import as_int, violations
+
+SAMPLE = 1024  # rows to fit relations on
+DENOM = 100  # largest denominator of a coefficient
+
+
+def equality(coef, const=0) -> str:
+    """An equality over variables in Dig format, e.g. `2*x - y + 3 == 0`.
+
+    Arguments:
+        coef: variable → integer coefficient, in order.
+        const: integer constant term.
+    """
+    div = reduce(gcd, [*coef.values(), const])
+    sign = -1 if next(iter(coef.values())) < 0 else 1
+    terms = ''
+    for v, c in coef.items():
+        c = sign * c // div
+        op = ('-' if c < 0 else '+') if terms else ('-' if c < 0 else '')
+        mul = '' if abs(c) == 1 else f'{abs(c)}*'
+        terms += f' {op} {mul}{v}' if terms else f'{op}{mul}{v}'
+    const = sign * const // div
+    tail = f' {"-" if const < 0 else "+"} {abs(const)}' if const else ''
+    return f'{terms}{tail} == 0'
+
+
+def __rows(values):
+    """Row sample, evenly spaced."""
+    n = len(values)
+    return values[np.linspace(0, n - 1, min(n, SAMPLE)).astype(int)]
+
+
+def __relation(sample, basis, j):
+    """Integer coefficients of column j as an affine combination of the
+    basis columns, or None."""
+    a = np.column_stack([np.ones(len(sample)), sample[:, basis]])
+    b = sample[:, j].astype(np.float64)
+    x, *_ = np.linalg.lstsq(a.astype(np.float64), b, rcond=None)
+    if not np.allclose(a @ x, b, rtol=0, atol=1e-6):
+        return None
+    fr = [Fraction(float(c)).limit_denominator(DENOM) for c in x]
+    den = lcm(*[f.denominator for f in fr])
+    return [int(f * den) for f in fr], den
+
+
+def analyze(values, vars_, affine=False) \
+        -> Tuple[List[int], List[str], Dict[str, List[str]]]:
+    """Find the columns that are implied by other columns.
+
+    Arguments:
+        values: trace values
+        vars_: variable names
+        affine: also drop affine combinations of other columns
+
+    Returns:
+        Indices of the columns to keep, the equalities of the dropped
+        columns, and the duplicates of each kept variable.
+    """
+    n_vars, invs, keep, same = len(vars_), [], [], {}
+    const = [not len(values) or bool(np.all(values[:, i] == values[0, i]))
+             for i in range(n_vars)]
+    seen = {}
+    for i in range(n_vars):
+        if const[i]:
+            c = values[0, i].item() if len(values) else 0
+            if c == int(c):
+                invs.append(equality({vars_[i]: 1}, -int(c)))
+                continue
+        key = np.ascontiguousarray(values[:, i]).tobytes()
+        if (r := seen.get(key)) is not None:
+            invs.append(equality({vars_[r]: 1, vars_[i]: -1}))
+            same.setdefault(vars_[r], []).append(vars_[i])
+            continue
+        seen[key] = i
+        keep.append(i)
+    if not affine or (data := as_int(values)) is None or \
+            data.dtype.kind == 'O':
+        return keep, invs, same
+    sample, basis = __rows(data), []
+    for j in keep:
+        if basis and (rel := __relation(sample, basis, j)):
+            (c0, *cs), den = rel
+            coef = {vars_[b]: c for b, c in zip(basis, cs) if c}
+            p = equality({**coef, vars_[j]: -den}, c0)
+            if coef and (bad := violations(p, vars_, data)) is not None \
+                    and not len(bad):
+                invs.append(p)
+                continue
+        basis.append(j)
+    return basis, invs, same
+
+
+def restate(invs: List[str], same: Dict[str, List[str]]) -> List[str]:
+    """Invariants, each followed by its copies for the duplicates of
+    its variables, one variable at a time.
+
+    Arguments:
+        invs: invariants over the kept variables
+        same: kept variable → names of its dropped duplicates
+    """
+    out = []
+    for p in invs:
+        out.append(p)
+        for v, dups in same.items():
+            pattern = re.compile(rf'(?<![\w.]){re.escape(v)}(?![\w.])')
+            if pattern.search(p):
+                out += [pattern.sub(d, p) for d in dups]
+    return out
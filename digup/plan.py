@@ -0,0 +1,238 @@
+"""Partition planning for DigUp.
+
+A plan is a list of variable-index subsets of size k, such that every
+two subsets have a symmetric difference of at least `diff`. For two
+k-subsets that is the same as sharing at most `k - ⌈diff/2⌉` indices,
+so a candidate is rejected exactly when one of its (overlap + 1)-subsets
+already occurs in an accepted subset. Keeping those subsets (as bitmasks)
+in a hash set makes each test O(1) in the number of accepted subsets.
+Filtering all k-subsets is still linear in C(n, k), so beyond SPREAD_MAX
+candidates an uncapped plan is a pair covering capped at CAP_PER_VAR
+partitions per variable instead.
+
+A `Planner` runs a plan within a time budget: it orders the partitions
+by expected yield, estimates their cost from the data and the runtimes
+of earlier partitions, and only dispatches partitions that still fit.
+"""
+import random
+import time
+from itertools import combinations as comb
+from math import comb as binom
+from typing import List, Tuple
+
+import numpy as np
+
+Part = Tuple[int, ...]
+SPREAD_MAX = 10 ** 5  # most k-subsets filtered by an uncapped plan
+CAP_PER_VAR = 10  # partitions per variable of a plan beyond SPREAD_MAX
+
+
+def __mask(ix):
+    """Bitmask of a set of indices."""
+    return sum(1 << i for i in ix)
+
+
+def __overlap(k, diff):
+    """Size of the smallest forbidden intersection of two k-subsets."""
+    return k - (diff + 1) // 2 + 1
+
+
+def __accept(c, t, used):
+    """Accept subset c, if it has no t-subset in `used`."""
+    keys = [__mask(s) for s in comb(c, t)] if t > 0 else [0]
+    if any(key in used for key in keys):
+        return False
+    used.update(keys)
+    return True
+
+
+def spread(n_vars: int, k: int, diff: int) -> List[Part]:
+    """All k-subsets of n_vars, greedily filtered to symmetric
+    difference ≥ diff, in lexicographic order."""
+    t, used = __overlap(k, diff), set()
+    return [c for c in comb(range(n_vars), k) if __accept(c, t, used)]
+
+
+def cover(n_vars: int, k: int, diff: int = 0) -> List[Part]:
+    """Greedy pair covering: k-subsets so that every pair of variables
+    occurs together in at least one subset.
+
+    Each subset starts from the uncovered pair with the most uncovered
+    neighbours, and grows by the variable that covers most new pairs.
+    Variables that would violate the `diff` separation are avoided,
+    unless no other variable remains.
+    """
+    if n_vars < k or k < 2:
+        return [tuple(range(n_vars))] if n_vars else []
+    t, used, result = __overlap(k, diff), set(), []
+    free = ~np.eye(n_vars, dtype=bool)
+    while free.any():
+        deg = free.sum(axis=0)
+        i, j = np.unravel_index(np.argmax(free * (deg + deg[:, None])),
+                                free.shape)
+        part = [int(i), int(j)]
+        while len(part) < k:
+            gain = free[part].sum(axis=0) * n_vars + deg
+            gain[part] = -1
+            order = np.argsort(-gain, kind='stable').tolist()
+            order = order[:n_vars - len(part)]
+            ok = lambda v: t > len(part) + 1 or all(
+                __mask(s + (v,)) not in used
+                for s in comb(part, t - 1))
+            part.append(next((v for v in order if ok(v)), order[0]))
+        part = tuple(sorted(part))
+        used.update(__mask(s) for s in comb(part, t)) if t > 0 else None
+        free[np.ix_(part, part)] = False
+        result.append(part)
+    return result
+
+
+def plan(n_vars: int, k: int, diff: int, cap: int = 0,
+         seed: int = 0) -> List[Part]:
+    """Plan the partitions of a trace with n_vars variables.
+
+    Arguments:
+        n_vars: number of variables
+        k: partition size
+        diff: minimum symmetric difference between partitions
+        cap: maximum number of partitions (0 = no limit, unless there
+            are more than SPREAD_MAX k-subsets). The plan always covers
+            every pair of variables, even if that takes more than `cap`
+            partitions.
+        seed: random seed for choosing the extra partitions
+
+    Returns:
+        List of partitions, as sorted tuples of variable indices.
+    """
+    if not cap and binom(n_vars, k) <= SPREAD_MAX:
+        return spread(n_vars, k, diff)
+    cap = cap or CAP_PER_VAR * n_vars
+    result, t, used = cover(n_vars, k, diff), __overlap(k, diff), set()
+    for part in result:
+        used.update(__mask(s) for s in comb(part, t)) if t > 0 else None
+    rng, misses = random.Random(seed), 0
+    while len(result) < cap and misses < 10 * cap and n_vars >= k:
+        c = tuple(sorted(rng.sample(range(n_vars), k)))
+        if __accept(c, t, used):
+            result.append(c)
+        else:
+            misses += 1
+    return result
+
+
+def magnitudes(values) -> np.ndarray:
+    """Log-magnitude of the largest value of every column."""
+    top = np.abs(values).max(axis=0, initial=0)
+    return np.log10(1 + top.astype(np.float64))
+
+
+def cost(n_rows, mags, part) -> float:
+    """Relative cost of running Dig on a partition: rows × candidate
+    terms of degree ≤ 2, scaled up for values of large magnitude.
+
+    Arguments:
+        n_rows: number of rows of the trace
+        mags: column log-magnitudes, see `magnitudes`
+        part: column indices of the partition
+    """
+    k, mag = len(part), mags[list(part)].max(initial=0)
+    return n_rows * (k + 1) * (k + 2) / 2 * (1 + mag / 8)
+
+
+def gain(sample, part, corr) -> float:
+    """Expected yield of a partition: the number of linear equalities
+    among its columns (rank deficiency of the rows), plus the mean
+    absolute correlation of its pairs of columns."""
+    x = sample[:, part].astype(np.float64)
+    x = x / np.maximum(np.abs(x).max(axis=0), 1)
+    x = np.column_stack([np.ones(len(x)), x])
+    eqs = min(x.shape) - np.linalg.matrix_rank(x)
+    pairs = corr[np.ix_(part, part)][np.triu_indices(len(part), 1)]
+    return eqs + (float(np.abs(pairs).mean()) if len(pairs) else 0)
+
+
+class Planner:
+    """Dispatch partitions by expected yield, within a time budget.
+
+    Iterating a planner yields the partitions to run, highest yield
+    first. Reporting finished partitions with `done` calibrates the
+    cost estimates: the median ratio of observed runtime to `cost`
+    scales later estimates. A partition is dispatched only if its
+    estimate fits the remaining time. If the remaining plan does not
+    fit, it is replaced by the plan of the largest smaller partitions
+    that fits, without subsets of the partitions that already ran.
+
+    Arguments:
+        values: trace values
+        k: initial partition size
+        diff: minimum symmetric difference between partitions
+        cap: maximum number of partitions (0 = no limit)
+        budget: seconds for the whole plan (0 = no limit)
+        jobs: number of partitions that run concurrently
+        sample: rows used to estimate the yield
+        start: time the budget started (default: now)
+    """
+
+    def __init__(self, values, k, diff, cap=0, budget=0, jobs=1,
+                 sample=256, start=None):
+        self.deadline = (start or time.time()) + budget if budget else None
+        rows = np.linspace(0, len(values) - 1, min(sample, len(values)))
+        self.values, self.k, self.diff, self.cap = values, k, diff, cap
+        self.sample = values[rows.astype(int)] if len(values) else values
+        self.mags = magnitudes(values)
+        self.jobs, self.ratios, self.ran = max(jobs, 1), [], []
+        self.start, self.costs, self.shrink = {}, {}, True
+        with np.errstate(all='ignore'):
+            corr = np.corrcoef(self.sample.astype(np.float64), rowvar=False)
+        self.corr = np.nan_to_num(np.atleast_2d(corr))
+        self.todo = self.__rank(plan(values.shape[1], k, diff, cap))
+
+    def __rank(self, parts):
+        n_rows = len(self.values)
+        self.costs.update({p: cost(n_rows, self.mags, p) for p in parts})
+        score = {p: gain(self.sample, p, self.corr) for p in parts}
+        return sorted(parts, key=lambda p: (-score[p], self.costs[p]))
+
+    def estimate(self, part):
+        """Estimated runtime (s) of a partition, if known."""
+        return float(np.median(self.ratios)) * self.costs[part] \
+            if self.ratios else None
+
+    def done(self, part):
+        """Report a partition that finished."""
+        if (t0 := self.start.pop(tuple(part), None)) is not None:
+            self.ratios.append((time.time() - t0) / self.costs[part])
+
+    def __shrink(self, left):
+        """If the rest of the plan takes too long, continue with the
+        largest smaller partitions whose plan fits the time left."""
+        need = lambda parts: sum(map(self.estimate, parts)) / self.jobs
+        if need(self.todo) <= left:
+            return
+        n_vars, sizes = self.values.shape[1], range(self.k - 1, 1, -1)
+        for k in sizes if self.shrink else []:
+            fresh = self.__rank([
+                p for p in plan(n_vars, k, self.diff, self.cap)
+                if not any(set(p) <= set(r) for r in self.ran)])
+            if need(fresh) <= left:
+                self.k, self.todo = k, fresh
+                return
+        self.shrink = False
+
+    def __next(self):
+        left = self.deadline - time.time() if self.deadline else None
+        if left is not None and self.ratios and self.todo:
+            self.__shrink(left)
+        fits = lambda p: left is None or not self.ratios or \
+            self.estimate(p) <= left
+        i = next((i for i, p in enumerate(self.todo) if fits(p)), None)
+        return None if i is None else self.todo.pop(i)
+
+    def __iter__(self):
+        while (part := self.__next()) is not None:
+            self.ran.append(part)
+            self.start[part] = time.time()
+            yield part
+
+    def __len__(self):
+        return len(self.ran) + len(self.todo)
@@ -0,0 +1,161 @@
+"""Per-partition profile of a DigUp run.
+
+With a profile file (DigUp option `-p FILE`, or env. variable PROFILE),
+DigUp records for every partition the time spent writing its trace,
+running Dig and parsing the result, the Dig exit status, and the number
+of invariants, new and duplicate. When the run ends, or the total
+timeout stops it, a summary is printed to stderr and the phases are
+saved as trace events, to view in chrome://tracing or Perfetto.
+
+Usage:
+    python3 -m digup TRACE -p profile.json [DIG-ARGS]
+"""
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from threading import Lock, get_ident
+
+from rich.console import Console
+from rich.table import Table
+
+PHASES = ['write', 'run', 'parse']
+TOP = 10  # slowest partitions in the summary
+
+__parts, __lanes, __lock = {}, {}, Lock()
+__path = [None]
+__t0 = [time.perf_counter()]
+
+
+def __now():
+    return time.perf_counter() - __t0[0]
+
+
+def __lane():
+    """Small integer id of the calling thread."""
+    with __lock:
+        return __lanes.setdefault(get_ident(), len(__lanes))
+
+
+def __rec(ix):
+    with __lock:
+        return __parts.setdefault(tuple(ix), {
+            'ix': tuple(ix), 'vars': [], 'start': __now(), 'stop': None,
+            'status': None, 'invs': 0, 'new': 0, 'runs': 0, 'spans': [],
+            **{p: 0.0 for p in PHASES}})
+
+
+def enable(path):
+    """Start profiling; path is the trace-event file."""
+    __path[0], __t0[0] = path, time.perf_counter()
+    __parts.clear()
+    __lanes.clear()
+
+
+def enabled():
+    return bool(__path[0])
+
+
+def begin(ix, vars_):
+    """Start a partition."""
+    if enabled():
+        __rec(ix)['vars'] = list(vars_)
+
+
+@contextmanager
+def __phase(rec, name):
+    start, lane = __now(), __lane()
+    try:
+        yield
+    finally:
+        dur = __now() - start
+        with __lock:
+            rec[name] += dur
+            rec['runs'] += name == 'run'
+            rec['spans'].append((name, start, dur, lane))
+
+
+def phase(ix, name):
+    """Context that times a phase (write, run, parse) of a partition."""
+    return __phase(__rec(ix), name) if enabled() else nullcontext()
+
+
+def status(ix, value):
+    """Set the status of a partition, e.g., cached or timeout."""
+    if enabled():
+        __rec(ix)['status'] = value
+
+
+def finish(ix, out):
+    """End the Dig runs of a partition, with their output."""
+    if enabled():
+        rec = __rec(ix)
+        rec['stop'] = __now()
+        rec['status'] = rec['status'] or ('ok' if out.strip() else 'empty')
+
+
+def count(ix, invs, new):
+    """Record the number of invariants of a partition, and new ones."""
+    if enabled():
+        rec = __rec(ix)
+        rec['invs'], rec['new'] = invs, new
+
+
+def __snapshot():
+    with __lock:
+        return [dict(r, spans=list(r['spans'])) for r in __parts.values()]
+
+
+def __total(rec):
+    return sum(rec[p] for p in PHASES)
+
+
+def events():
+    """Trace events: a span per partition and each of its phases."""
+    us = lambda t: round(t * 1e6)
+    result = []
+    for rec in __snapshot():
+        lane = rec['spans'][0][3] if rec['spans'] else 0
+        stop = rec['stop'] if rec['stop'] is not None else __now()
+        args = {k: rec[k] for k in ['invs', 'new', 'runs']}
+        args['status'] = rec['status'] or 'stopped'
+        result.append({
+            'name': ','.join(rec['vars']), 'cat': 'part', 'ph': 'X',
+            'ts': us(rec['start']), 'dur': us(stop - rec['start']),
+            'pid': 1, 'tid': lane, 'args': args})
+        result += [{'name': name, 'cat': 'phase', 'ph': 'X', 'ts': us(s),
+                    'dur': us(d), 'pid': 1, 'tid': tid}
+                   for name, s, d, tid in rec['spans']]
+    return result
+
+
+def summary():
+    """Table of the slowest partitions, with totals by status."""
+    parts = __snapshot()
+    stat = Counter(r['status'] or 'stopped' for r in parts)
+    caption = ', '.join(f'{n} {s}' for s, n in stat.most_common())
+    sums = [sum(r[p] for r in parts) for p in PHASES]
+    table = Table(title=f'{len(parts)} partitions in {__now():.1f} s',
+                  caption=f'{caption}; dup = duplicate invariants')
+    for col in ['partition', 'status', *PHASES, 'invs', 'new', 'dup']:
+        table.add_column(col, justify='left' if col in
+                         ['partition', 'status'] else 'right')
+    for r in sorted(parts, key=__total, reverse=True)[:TOP]:
+        table.add_row(','.join(r['vars']), r['status'] or 'stopped',
+                      *[f'{r[p]:.2f}' for p in PHASES],
+                      *map(str, [r['invs'], r['new'], r['invs'] - r['new']]))
+    table.add_section()
+    table.add_row('total', '', *[f'{s:.2f}' for s in sums],
+                  *map(str, [sum(r[k] for r in parts) for k in
+                             ['invs', 'new']]),
+                  str(sum(r['invs'] - r['new'] for r in parts)))
+    return table
+
+
+def save():
+    """Print the summary to stderr and write the trace-event file."""
+    if enabled():
+        Console(stderr=True).print(summary())
+        with open(__path[0], 'w') as fp:
+            json.dump({'traceEvents': events(),
+                       'displayTimeUnit': 'ms'}, fp)
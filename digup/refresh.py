@@ -0,0 +1,40 @@
+"""Incremental refresh of Dig and DigUp results, for appended rows.
+
+Rows appended to a trace can only falsify invariants. The invariants
+of a result are checked on the new rows only, with NumPy, and those
+that hold are kept. The weaker invariants that replace a falsified one
+are over its variables, so Dig runs again only on the variables of the
+falsified invariants, on all rows.
+
+Usage:
+    python3 -m digup RESULT NEW [DIG-ARGS]
+
+RESULT is a .dig or .digup result of a trace in `IN_DIR`, and NEW a
+trace of the rows appended to it, with the same header. RESULT is
+rewritten; append NEW to the trace before the next refresh.
+"""
+from typing import List, Tuple
+
+from scripts.evaluate import violations
+from scripts.predicate import names
+
+
+def split(invs, vars_, rows) -> Tuple[List[str], List[str]]:
+    """Split invariants into those that hold on the rows, and the rest.
+
+    Invariants that cannot be checked exactly count as falsified.
+    """
+    kept, broken = [], []
+    for p in invs:
+        bad = violations(p, vars_, rows)
+        (kept if bad is not None and not len(bad) else broken).append(p)
+    return kept, broken
+
+
+def partitions(broken, vars_) -> List[Tuple[int, ...]]:
+    """Variable indices of the falsified invariants, without those
+    contained in another."""
+    sets = {tuple(i for i, v in enumerate(vars_) if v in names(p))
+            for p in broken}
+    return sorted(s for s in sets if s and not any(
+        set(s) < set(t) for t in sets))
@@ -0,0 +1,65 @@
+"""Row-sampled inference for long traces.
+
+Dig runs on a small sample of the rows, and the candidate invariants
+are then validated on all rows with NumPy. If a candidate fails, Dig
+runs again on a larger sample that includes the counterexamples, until
+all candidates hold or the sample covers the whole trace.
+"""
+from math import ceil
+
+import numpy as np
+
+from scripts import dig_p
+from scripts.evaluate import violations
+
+
+def stratify(values, n, seed=0):
+    """Choose about n rows, stratified by the value range of each column.
+
+    Every column contributes rows at evenly spaced ranks of its
+    values, so the sample includes the extremes of all columns.
+
+    Returns:
+        Sorted row indices.
+    """
+    m, cols = values.shape
+    if n >= m:
+        return np.arange(m)
+    ranks = np.linspace(0, m - 1, max(2, ceil(n / max(cols, 1))))
+    ranks = ranks.round().astype(int)
+    order = np.argsort(values, axis=0, kind='stable')
+    rows = np.unique(order[ranks].ravel())
+    if len(rows) < n:
+        rest = np.setdiff1d(np.arange(m), rows)
+        fill = np.random.default_rng(seed).choice(
+            rest, n - len(rows), replace=False)
+        rows = np.union1d(rows, fill)
+    return rows
+
+
+def infer(run, vars_, values, n, cex=5):
+    """Infer invariants from a row sample, valid for all rows.
+
+    Arguments:
+        run: function that runs Dig on a values matrix.
+        vars_: variable names.
+        values: trace values.
+        n: initial sample size.
+        cex: counterexample rows to add per falsified candidate.
+
+    Returns:
+        Dig output of the last run.
+    """
+    values = np.unique(values, axis=0)
+    rows = stratify(values, n)
+    while True:
+        out = run(values[rows])
+        if len(rows) >= len(values):
+            return out
+        bad = [violations(p, vars_, values)
+               for p in dig_p(out.split('\n'))]
+        bad = [np.arange(len(values)) if b is None else b for b in bad]
+        if not (bad := [b[:cex] for b in bad if len(b)]):
+            return out
+        n = 2 * max(n, len(rows))
+        rows = np.union1d(stratify(values, n), np.concatenate(bad))
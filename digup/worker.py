@@ -0,0 +1,259 @@
+"""Warm Dig workers.
+
+A worker is a long-lived interpreter that imports Dig once and then
+serves jobs over a pipe, instead of paying the interpreter and import
+startup of a fresh `dig.py` process for every partition.
+
+Usage:
+    python -m digup.worker                        (serve on stdin/stdout)
+    python -m digup.worker OUT TRACE… [-- ARGS…]  (batch run to OUT/*.dig)
+"""
+import io
+import pickle
+import resource
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import datetime
+from os.path import join, dirname, abspath
+from pathlib import Path
+from select import select
+from threading import Lock
+
+from scripts.env import *
+from scripts.memory import MEM_CODE, capped, oom
+
+ROOT = dirname(dirname(abspath(__file__)))
+DIG = join(ROOT, 'dig', 'src', 'dig.py')
+
+LIVE, LOCK = set(), Lock()
+__memfd = [None if STREAM and hasattr(os, 'memfd_create') else False]
+
+
+def peak_mb():
+    """Peak resident set size of this process, in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+
+def __run(path, args):
+    sys.argv, out, err = [DIG, path, *args], io.StringIO(), io.StringIO()
+    try:
+        with redirect_stdout(out), redirect_stderr(err):
+            runpy.run_path(DIG, run_name='__main__')
+    except MemoryError:
+        raise
+    except (Exception, SystemExit):
+        pass
+    if oom(None, err.getvalue()):
+        raise MemoryError(path)
+    return out.getvalue()
+
+
+def __dig(src, args):
+    """Run Dig in this interpreter and capture its output.
+
+    A (variables, values) trace is passed to Dig as an anonymous
+    in-memory file, where available, else as a temporary file. Until
+    an in-memory run has output, one without output runs again on a
+    file; if that has output, Dig cannot read in-memory files and this
+    worker uses files after.
+
+    Arguments:
+        src: path to a trace, or a (variables, values) pair
+        args: Dig arguments
+    """
+    from scripts import trace_text
+    if isinstance(src, str):
+        return __run(src, args)
+    text = trace_text(*src)
+    if __memfd[0] is not False:
+        with os.fdopen(os.memfd_create('trace'), 'w') as fp:
+            fp.write(text)
+            fp.flush()
+            out = __run(f'/proc/self/fd/{fp.fileno()}', args)
+        if out.strip() or __memfd[0]:
+            __memfd[0] = True
+            return out
+    Path(TMP).mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', dir=TMP, delete=False) as fp:
+        fp.write(text)
+    try:
+        out = __run(fp.name, args)
+        if __memfd[0] is None:
+            __memfd[0] = not out.strip()
+        return out
+    finally:
+        os.remove(fp.name)
+
+
+def serve():
+    """Worker loop: read jobs from stdin and reply on stdout.
+
+    Stray writes to file descriptor 1 are redirected to stderr, so
+    that only pickled replies appear on the reply channel; Dig's
+    standard error is captured per job, like that of a Dig process. A job that
+    runs out of memory has no output, and stops the worker.
+    """
+    os.chdir(ROOT)
+    sys.path.insert(0, dirname(DIG))
+    reply = os.fdopen(os.dup(1), 'wb')
+    os.dup2(2, 1)
+    jobs = sys.stdin.buffer
+    with redirect_stdout(io.StringIO()):
+        try:  # import Dig and its dependencies once
+            runpy.run_path(DIG, run_name='__warm__')
+        except (Exception, SystemExit):
+            pass
+    pickle.dump(peak_mb(), reply)
+    reply.flush()
+    while True:
+        try:
+            src, args = pickle.load(jobs)
+        except EOFError:
+            break
+        try:
+            out = __dig(src, args)
+        except MemoryError:
+            out = None
+        pickle.dump((out, peak_mb()), reply)
+        reply.flush()
+        if out is None:
+            break
+
+
+def shutdown():
+    """Kill all worker processes."""
+    with LOCK:
+        for proc in LIVE:
+            proc.kill()
+
+
+class Worker:
+    """Handle to a warm Dig worker process.
+
+    The worker is (re)started lazily. It is recycled after `W_JOBS`
+    jobs, when its peak memory has grown by more than `W_MEM` MB since
+    start, when the Dig arguments change, or after a timeout. Its
+    address space is capped at MEM_MB.
+    """
+
+    def __init__(self):
+        self.proc, self.args, self.jobs, self.base = None, None, 0, 0
+
+    def __spawn(self, args):
+        self.proc = subprocess.Popen(
+            capped([sys.executable, '-O', '-m', 'digup.worker']),
+            cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL)
+        with LOCK:
+            LIVE.add(self.proc)
+        self.args, self.jobs = args, 0
+        self.base = pickle.load(self.proc.stdout)
+
+    def run(self, src, args, timeout=SPROC_TO):
+        """Run Dig on a trace in the worker.
+
+        Arguments:
+            src: path to a trace, or a (variables, values) pair
+            args: Dig arguments
+            timeout: seconds to wait for the result
+
+        Raises:
+            TimeoutExpired: if the job does not complete in time.
+            MemoryError: if the job runs out of memory.
+
+        Returns:
+            Dig output, or empty string if the worker failed.
+        """
+        args = list(args)
+        try:
+            if self.proc is None or self.args != args:
+                self.close()
+                self.__spawn(args)
+            pickle.dump((src, args), self.proc.stdin)
+            self.proc.stdin.flush()
+            if not select([self.proc.stdout], [], [], timeout)[0]:
+                self.close()
+                raise subprocess.TimeoutExpired(DIG, timeout)
+            out, mem = pickle.load(self.proc.stdout)
+        except (EOFError, OSError, pickle.UnpicklingError):
+            if oom(self.__exit_code()):
+                out = None
+            else:
+                self.close()
+                return ''
+        if out is None:
+            self.close()
+            raise MemoryError(DIG)
+        self.jobs += 1
+        if self.jobs >= W_JOBS or mem - self.base > W_MEM:
+            self.close()
+        return out
+
+    def __exit_code(self):
+        """Exit code of a worker that stopped replying, if it exited."""
+        try:
+            return self.proc.wait(1)
+        except subprocess.TimeoutExpired:
+            return None
+
+    def close(self):
+        """Stop the worker process."""
+        if proc := self.proc:
+            self.proc = None
+            proc.kill()
+            proc.wait()
+            for pipe in (proc.stdin, proc.stdout):
+                pipe.close()
+            with LOCK:
+                LIVE.discard(proc)
+
+
+def batch(out_dir, traces, args):
+    """Run Dig on many traces, reusing one warm worker.
+
+    Results are written to `out_dir/<name>.dig`, and every run is
+    recorded in `out_dir/_log.txt` like the experiment runner does.
+
+    Arguments:
+        out_dir: results directory
+        traces: paths to input traces
+        args: Dig arguments common to all traces
+    """
+    from scripts import b_name, dig_args
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    worker, log = Worker(), join(out_dir, '_log.txt')
+    try:
+        for fp in traces:
+            name, code = b_name(fp), 0
+            args_ = args + dig_args(name)
+            start = time.time()
+            try:
+                out = worker.run(abspath(fp), args_, TOTAL_TO)
+            except subprocess.TimeoutExpired:
+                out, code = '', 129
+            except MemoryError:
+                out, code = '', MEM_CODE
+            with open(join(out_dir, f'{name}.dig'), 'w') as f:
+                f.write(out)
+            cmd = ' '.join(['digup.worker', fp] + args_)
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            with open(log, 'a') as f:
+                f.write(f'{now} ({int(time.time() - start)} s) '
+                        f'{code} {cmd}\n----\n')
+    finally:
+        worker.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        serve()
+    else:
+        target, *rest = sys.argv[1:]
+        sep = rest.index('--') if '--' in rest else len(rest)
+        batch(target, rest[:sep], rest[sep + 1:])
@@ -0,0 +1,159 @@
+"""Durable work queue of DigUp partitions, in a shared directory.
+
+A DigUp run with `-q DIR` copies its trace to DIR and adds its planned
+partitions to the SQLite queue DIR/queue.db. Worker threads, in this
+process or in other processes and hosts that share DIR, claim
+partitions with a lease, run Dig and store the output. Leases are
+renewed while Dig runs; the partitions of a worker that dies are
+claimed again when the lease expires, at most TRIES times. The run
+itself merges outputs in order of completion, and a run that is
+stopped resumes from the partitions already done.
+
+Usage:
+    python3 -m digup TRACE -q DIR [-j N] [DIG-ARGS]  (plan, work, merge)
+    python3 -m digup -q DIR [-j N] [-w]              (work only)
+"""
+import hashlib
+import json
+import shutil
+import socket
+import sqlite3
+import time
+from os.path import join, abspath, getsize, getmtime, isfile
+from pathlib import Path
+from threading import Lock
+from typing import Iterator, List, Optional, Tuple
+
+from scripts.env import *
+
+TRIES = 3  # claims of a partition before it fails
+POLL = 0.5  # seconds between checks for finished partitions
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run TEXT PRIMARY KEY, name TEXT, trace TEXT, args TEXT, keep TEXT);
+CREATE TABLE IF NOT EXISTS parts (
+    run TEXT, ix TEXT, state TEXT DEFAULT 'todo', owner TEXT,
+    lease REAL DEFAULT 0, tries INTEGER DEFAULT 0, seq INTEGER,
+    out TEXT, PRIMARY KEY (run, ix));
+"""
+
+
+def owner() -> str:
+    """Worker identity: host and process."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class WorkQueue:
+    """Partitions of DigUp runs, shared by worker processes.
+
+    Arguments:
+        path: queue directory.
+        lease: seconds a claim is valid without renewal.
+    """
+
+    def __init__(self, path: str, lease: int = LEASE):
+        Path(path).mkdir(parents=True, exist_ok=True)
+        self.dir, self.lease, self.lock = path, lease, Lock()
+        self.db = sqlite3.connect(
+            join(path, 'queue.db'), timeout=60, isolation_level=None,
+            check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def __tx(self, sql, *params):
+        """Run statements in one write transaction; a statement with a
+        list of parameter tuples runs once per tuple."""
+        run = lambda q, p: self.db.executemany(q, p) \
+            if isinstance(p, list) else self.db.execute(q, p)
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                res = [run(q, p).fetchall() for q, p in zip(sql, params)]
+                self.db.execute('COMMIT')
+                return res
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+
+    def submit(self, fp: str, args: List[str], keep: List[int],
+               parts: List[Tuple[int, ...]]) -> str:
+        """Add the partitions of a trace, unless already queued.
+
+        Returns:
+            The run identifier.
+        """
+        fp, keep = abspath(fp), list(map(int, keep))
+        run = hashlib.sha256(json.dumps(
+            [fp, getsize(fp), getmtime(fp), list(args), keep]).encode()
+        ).hexdigest()[:16]
+        if not isfile(trace := join(self.dir, f'{run}.csv')):
+            shutil.copyfile(fp, f'{trace}.part')
+            os.replace(f'{trace}.part', trace)
+        name = Path(fp).stem
+        self.__tx(['INSERT OR IGNORE INTO runs VALUES (?, ?, ?, ?, ?)'],
+                  (run, name, f'{run}.csv', json.dumps(list(args)),
+                   json.dumps(keep)))
+        self.__tx(['INSERT OR IGNORE INTO parts (run, ix) VALUES (?, ?)'],
+                  [(run, json.dumps(list(map(int, ix)))) for ix in parts])
+        return run
+
+    def run(self, run: str):
+        """Name, trace path, Dig arguments and kept columns of a run."""
+        with self.lock:
+            name, trace, args, keep = self.db.execute(
+                'SELECT name, trace, args, keep FROM runs WHERE run = ?',
+                (run,)).fetchone()
+        return name, join(self.dir, trace), json.loads(args), \
+            json.loads(keep)
+
+    def claim(self, who: str) -> Optional[Tuple[str, Tuple[int, ...]]]:
+        """Claim the next open or expired partition, if any.
+
+        Expired partitions that were claimed TRIES times fail.
+        """
+        now = time.time()
+        _, res = self.__tx([
+            "UPDATE parts SET state = 'failed', out = '', "
+            "seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM parts) "
+            "WHERE state = 'busy' AND lease < ? AND tries >= ?",
+            "UPDATE parts SET state = 'busy', owner = ?, lease = ?, "
+            "tries = tries + 1 WHERE rowid = (SELECT rowid FROM parts "
+            "WHERE state = 'todo' OR (state = 'busy' AND lease < ?) "
+            "ORDER BY rowid LIMIT 1) RETURNING run, ix"],
+            (now, TRIES), (who, now + self.lease, now))
+        return (res[0][0], tuple(json.loads(res[0][1]))) if res else None
+
+    def renew(self, who: str):
+        """Extend the leases of the partitions of a worker."""
+        self.__tx(["UPDATE parts SET lease = ? "
+                   "WHERE owner = ? AND state = 'busy'"],
+                  (time.time() + self.lease, who))
+
+    def complete(self, run: str, ix, out: str):
+        """Store the Dig output of a partition."""
+        self.__tx([
+            "UPDATE parts SET state = 'done', out = ?, "
+            "seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM parts) "
+            "WHERE run = ? AND ix = ? AND state = 'busy'"],
+            (out or '', run, json.dumps(list(map(int, ix)))))
+
+    def open(self, run: str = None) -> int:
+        """Number of partitions not yet done or failed."""
+        with self.lock:
+            return self.db.execute(
+                "SELECT COUNT(*) FROM parts WHERE state IN ('todo', 'busy')"
+                " AND (? IS NULL OR run = ?)", (run, run)).fetchone()[0]
+
+    def results(self, run: str) -> Iterator[Tuple[Tuple[int, ...], str]]:
+        """Outputs of the partitions of a run, in order of completion,
+        until all are done or failed."""
+        seq = 0
+        while True:
+            with self.lock:
+                rows = self.db.execute(
+                    "SELECT seq, ix, out FROM parts WHERE run = ? AND "
+                    "seq > ? ORDER BY seq", (run, seq)).fetchall()
+            for seq, ix, out in rows:
+                yield tuple(json.loads(ix)), out
+            if not rows and not self.open(run):
+                return
+            time.sleep(0 if rows else POLL)
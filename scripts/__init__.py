@@ -1,21 +1,13 @@
-from argparse import Namespace
-from collections import Counter
-from functools import reduce
-from itertools import product
-# noinspection PyUnresolvedReferences
-from math import *
-from os import listdir
-from os.path import isfile, basename, splitext, join
-from random import randint
-from typing import Tuple
+import shlex
+import sys
+from fractions import Fraction
+from functools import lru_cache
+from os.path import basename, splitext, join, isfile
+from typing import Any, Iterable, Tuple
 
 import numpy as np
-import pandas as pd
-import yaml
-from prettytable import PrettyTable as PrettyT
-from rich.progress import Progress
-from z3 import *
 
+from . import columnar
 from .env import *
 
 
@@ -31,6 +23,7 @@ def read_lines(fn):
 
 def read_yaml(path):
     """Read (and parse) a yaml file"""
+    import yaml
     with open(path, 'r', encoding='utf-8') as yml:
         return yaml.safe_load(yml)
 
@@ -45,6 +38,16 @@ def b_name(file_path):
     return splitext(basename(file_path))[0]
 
 
+def dig_args(name):
+    """Benchmark-specific Dig arguments from the `ARGS_F` file."""
+    if isfile(ARGS_F):
+        with open(ARGS_F, 'r') as fp:
+            for line in fp:
+                if (parts := line.split(' ', 1))[0] == name:
+                    return shlex.split(parts[-1])
+    return []
+
+
 def is_ds(f):
     return f.startswith("ds_")
 
@@ -75,13 +78,6 @@ def lmap(f, iterable):
     return list(map(f, iterable))
 
 
-def fresh_solver(sol=None):
-    solver = sol or Solver()
-    solver.reset() if sol else None
-    solver.set("timeout", Z3_TO)
-    return solver
-
-
 def parse_times(input_file):
     """Parse times experiment results."""
     return [x.split(',') for x in read_lines(input_file)]
@@ -98,16 +94,6 @@ def dig_p(lines: List[str]):
     return [dig_mod_repair(p) for p in pl]
 
 
-def sym_min(*vs):
-    """Python min evaluation for Z3."""
-    return reduce(lambda x, m: If(x < m, x, m), vs[1:], vs[0])
-
-
-def sym_max(*vs):
-    """Python max evaluation for Z3."""
-    return reduce(lambda x, m: If(x > m, x, m), vs[1:], vs[0])
-
-
 def dict_rev(dct):
     """Reverse dictionary keys and values."""
     uniq = set(map(str, dct.values()))
@@ -116,16 +102,12 @@ def dict_rev(dct):
 
 
 def read_trace(path: str) -> Tuple[np.array, List[str], str]:
-    """Reads a DIG trace into memory."""
-    df = pd.read_csv(path, sep=T_SEP)
-    idx_slice, variables, loc = [], [], df.columns[0]
-    for i, c in enumerate(df.columns[1:]):
-        if not c.lower().startswith('unnamed:'):
-            if c2 := str(c).strip().replace(T_PREFIX, ''):
-                idx_slice.append(i + 1)
-                variables.append(c2)
-    data = np.array(df.values[:, idx_slice], dtype=T_DTYPE)
-    return data, variables, loc
+    """Reads a DIG trace into memory.
+
+    With a trace cache (T_CACHE), the trace is parsed once and then
+    memory-mapped from its binary form; the values are read-only.
+    """
+    return columnar.load(path) if T_CACHE else columnar.parse(path)
 
 
 def trace_to_csv(input_file: str):
@@ -138,20 +120,29 @@ def trace_to_csv(input_file: str):
 
 def csv_to_trace(input_file: str):
     """Convert a CSV file to a DIG trace."""
+    import pandas as pd
     init = pd.read_csv(input_file, sep=C_SEP)
     construct_trace(init.columns, init.values)
 
 
-def construct_trace(vars_: List[str], values, fn=sys.stdout):
-    np_val = np.array(values)
+def trace_text(vars_: List[str], values) -> str:
+    """Format values as a DIG trace, integers without a fraction."""
+    np_val = np.asarray(values)
     int_test = np_val.astype(int)
     data = int_test if np.all(np_val == int_test) else np_val
-    var = [f'{T_PREFIX}{x}' for x in vars_]
-    data = np.vstack([np.array(var), data])
-    prefix = np.full((data.shape[0], 1), T_LABEL)
-    data = np.hstack([prefix, data])
-    # noinspection PyTypeChecker
-    np.savetxt(fn, data, delimiter=T_SEP, fmt='%s')
+    head = [T_LABEL] + [f'{T_PREFIX}{x}' for x in vars_]
+    row = T_SEP.join([T_LABEL] + ['%s'] * data.shape[1]) + '\n'
+    rows = (row * len(data)) % tuple(data.ravel().tolist())
+    return T_SEP.join(head) + '\n' + rows
+
+
+def construct_trace(vars_: List[str], values, fn=sys.stdout):
+    """Write values as a DIG trace to a file (path) or stream."""
+    if isinstance(fn, str):
+        with open(fn, 'w') as fp:
+            fp.write(trace_text(vars_, values))
+    else:
+        fn.write(trace_text(vars_, values))
 
 
 def tokenize(plain: str, tokens: List[str] = None) -> PT:
@@ -168,7 +159,11 @@ def tokenize(plain: str, tokens: List[str] = None) -> PT:
     Returns:
         The tokenized string.               
     """
-    tokens_ = tokens or TOKENS
+    return list(__tokenize(plain, tuple(tokens or TOKENS)))
+
+
+@lru_cache(maxsize=None)
+def __tokenize(plain: str, tokens_: Tuple[str]) -> Tuple[str]:
     exists = [x for x in tokens_ if re.search(x, plain)]
     terms = re.split(f'({WSP})', plain.replace(' ', WSP))
     for x in exists:
@@ -182,7 +177,10 @@ def tokenize(plain: str, tokens: List[str] = None) -> PT:
                 after = tmp[i + 1:] if i < n else []
                 tmp = before + parts + after
         terms = tmp
-    return terms
+    return tuple(terms)
+
+
+tokenize.cache_clear = __tokenize.cache_clear
 
 
 def qt_fmt(value: T_DTYPE):
@@ -230,244 +228,3 @@ def to_assert(var: List[str], val, pred: PT, smt: bool = False) -> P:
     subst = [sym_minmax(x) for x in subst] if smt else subst
     subst = [(' ' if x == WSP else x) for x in subst]
     return ''.join([str(s) for s in subst])
-
-
-def find_cex(pred: List[P], limit: int = 3) -> str:
-    """Find (at most limit) failing assertions."""
-    cex, solver, pool = [], None, pred[:]
-    while pool and len(cex) < limit:
-        lit, solver = pool.pop(), fresh_solver(solver)
-        solver.add(eval(lit))
-        if solver.check() != sat:
-            cex.append(lit)
-    return ', '.join(cex)
-
-
-def check(fn: str) -> bool:
-    """Sanity check to confirm DIG invariants are valid on a trace.
-
-    Checks that DIG invariants are valid for the input data. Displays,
-    at stdout, the evaluation result for every invariant.
-
-    Arguments:
-        fn (str): path to the DIG results file to check.
-
-    Returns:
-        True if all invariants are satisfactory.
-    """
-    src = input_csv(b_name(fn))
-    predicates = parse_dig_result(fn)
-    data, var = read_trace(src)[:2]
-    solver, all_t, rows = None, True, []
-    for p in predicates:
-        solver = fresh_solver(solver)
-        pred = tokenize(p, TOKENS)
-        cex, sc, expr = '', None, []
-        idx, occ = zip(*[c for c in enumerate(var) if c[1] in pred])
-        for val in np.unique(data[:, idx], axis=0):
-            expr.append(lit := to_assert(occ, val, pred))
-            try:
-                solver.add(eval(lit))
-            except z3types.Z3Exception:
-                pass  # '⚠ symbolic'
-            if (sc := solver.check()) == unsat:
-                all_t, cex = False, find_cex(expr)
-        rows.append([p, sc, cex])
-    table = PrettyT(["P(…)", "eval(P)", "CEX"])
-    table.add_rows(rows)
-    print(table)
-    return all_t
-
-
-def rand_data(in_v, ranges, expr, has_o) -> List[T_DTYPE]:
-    """Calculate value of a function for random inputs.
-
-    Given an expression with variables,
-        1. Choose random value for each variable.
-        2. Substitute all variables in expression with values.
-        3. Evaluate the expression to get output value.
-
-    Arguments:
-        in_v: input variables that occur in expr.
-        ranges: (min, max) of each variable.
-        expr: literal (str) of a function to evaluate.
-        has_o: true if evaluation returns values
-
-    Raises:
-        Exception: if `expr` contains variables not in `in_vars`
-            or other expressions outside the Python math stdlib.
-
-    Returns:
-        A row of data, of selected inputs and the calculated output.
-    """
-    dt_v = lambda nx: randint(*nx) if isinstance(nx, list) else nx
-    data = lmap(dt_v, ranges)
-    res = as_list(eval(to_assert(in_v, data, expr))) if has_o else []
-    return data + res
-
-
-def generate(f_name):
-    """Generate random function traces based on configuration."""
-    if f_name not in (conf := read_yaml(F_CONFIG)):
-        raise Exception(f'No generator known for {f_name}!')
-    fun = Namespace(**conf[f_name])
-    fin = fun.vin if fun.vin else {}
-    p, has_o = tokenize(fun.expr, TOKENS), len(as_list(fun.vo)) > 0
-    vrs, r = map(list, [fin.keys(), fin.values()])
-    values = [rand_data(vrs, r, p, has_o) for _ in range(fun.n)]
-    construct_trace(c_vars(conf[f_name]), values)
-
-
-# noinspection PyPep8Naming
-def stats(dir_path):
-    """Display statistics about a directory."""
-    is_trace = lambda f: f.endswith(".csv") and '_' in f
-    if files := list(filter(is_trace, listdir(dir_path))):
-        # traces stats
-        pt = Counter([f.split('_', 1)[0] for f in files])
-        pt['∑'] = sum(pt.values())
-        T1 = PrettyT(list(pt.keys()), title='Traces by kind')
-        T1.add_row(list(pt.values()))
-
-        # variable frequencies
-        vl = [len(read_trace(join(dir_path, f))[1]) for f in files]
-        scope = [(x, 0) for x in range(min(vl), max(vl) + 1)]
-        dct = {**dict(scope), **Counter(vl), ' ∑ ': sum(vl)}
-        T2 = PrettyT(lmap(str, dct.keys()))
-        T2.title = 'Variable counts (frequency)'
-        T2.add_row(list(dct.values()))
-
-        # datasets
-        fmap = lambda f: map(len, read_trace(join(dir_path, f))[:2])
-        vals = lambda f: list(reversed(list(fmap(f))))
-        data = [[b_name(f)] + vals(f) for f in filter(is_ds, files)]
-        T3 = PrettyT(['Name', 'V', 'N'], title='Datasets', align='l')
-        T3.add_rows(sorted(data))
-
-        # invariant configurations
-        cf = read_yaml(F_CONFIG)
-        fft = lambda f: f.replace(' ', '')
-        kfm = lambda l: ','.join(sorted(l))
-        rfm = lambda x: fft(x) if x.startswith('[') else f'={x}'
-        formulae = [fft(x['formula']) for x in cf.values()]
-        rng = [[kfm(k) + rfm(r) for r, k in dict_rev(vin).items()]
-               for vin in [op['vin'] or {} for op in cf.values()]]
-        T4 = PrettyT(title='Invariant benchmarks')
-        T4.add_column('Name', list(cf), align='l')
-        T4.add_column('V', lmap(len, lmap(c_vars, cf.values())))
-        T4.add_column('N', [x['n'] for x in cf.values()])
-        T4.add_column('Formula', formulae, align='l')
-        T4.add_column('Ranges', [' '.join(x) for x in rng], align='l')
-
-        print('\n\n'.join(map(str, [T1, T2, T3, T4])))
-
-
-# noinspection PyPep8Naming
-def score(dir_path):
-    """Score analysis results at `dir_path`."""
-    digs = lambda f: f.endswith(".dig") or f.endswith(".digup")
-    is_t = lambda f: f.endswith(".time")
-    files = list(filter(digs, listdir(dir_path)))
-    srcs = [input_csv(b_name(f)) for f in files]
-    conf = read_yaml(F_CONFIG)
-    base_h = 'Detector,Benchmark,V,I,=,≤,%,↕'.split(',')
-    T1, T2, T3 = PrettyT(base_h + ['✔']), PrettyT(base_h), None
-
-    for f, s in sorted([x for x in zip(files, srcs) if isfile(x[1])]):
-        name, ext = b_name(f), f.rsplit('.', 1)[-1]
-        res = parse_dig_result(join(dir_path, f))
-        vrs = read_trace(s)[1]
-        row = [ext, name, len(vrs), len(res)]
-        stats_ = np.array([np.zeros(4)])
-        if len(res):
-            stats_ = np.array([[
-                1 if '==' in pred else 0,
-                1 if '<=' in pred else 0,
-                pred.count('%'),
-                pred.count('min') + pred.count('max')]
-                for pred in [tokenize(term, TOKENS) for term in res]])
-        row += np.sum(stats_, axis=0).astype(int).tolist()
-
-        if not is_ds(f):
-            mtc, resp = False, '✗'
-            pool = list(product(as_list(conf[name]['goal']), res))
-            while pool and not mtc:
-                res = term_eq(vrs, *pool.pop())
-                mtc = res == unsat
-                resp = '?' if res == unknown else resp
-            row.append('✔' if mtc else resp)
-        (T2 if is_ds(f) else T1).add_row(row)
-
-    if times := list(filter(is_t, listdir(dir_path))):
-        sec_f = lambda t: round(float(t) / T_FMT, 1)
-        t_fmt = lambda t: (int(t) if T_FMT <= 1 else sec_f(t))
-        res, sizes = {}, set()
-
-        for f in sorted(times):
-            rows = parse_times(join(dir_path, f))
-            res[bm := b_name(f)] = {}
-            tools = [(x, {}) for x in set([r[0] for r in rows])]
-            res[bm].update(**dict(sorted(tools, reverse=True)))
-            sizes.update(set([int(r[1]) for r in rows]))
-            for row in rows:
-                res[bm][row[0]][int(row[1])] = \
-                    (t_fmt(dur) if (dur := row[-1]) else '')
-
-        sizes = sorted(list(sizes))
-        unit = 's' if T_FMT == 1000 else 'ms'
-        head = 'Benchmark,Detector'.split(',')
-        szh = [f'N={n}, {unit}' for n in sizes]
-        T3 = PrettyT(head + szh, align='r')
-
-        for bm, val in res.items():
-            for dt, tms in val.items():
-                times = [tms[n] if n in tms else '' for n in sizes]
-                T3.add_row([bm, dt.lower()] + times)
-
-    for x in [T1, T2, T3]:
-        for i in [0, 1]:
-            if x:
-                x.align[x.field_names[i]] = 'l'
-    print('\n\n'.join(map(str, filter(lambda x: x, [T1, T2, T3]))))
-
-
-def match(fn):
-    """Count matching invariants between Dig and DigUp.
-
-    Arguments:
-        fn: DigUp results file
-    """
-    fc = fn.replace('.digup', '.dig')
-    trc, mtc, tgt = input_csv(b_name(fn)), 0, []
-    if fn.endswith(".digup") and all(map(isfile, [fn, fc, trc])):
-        src, tgt = map(parse_dig_result, [fn, fc])
-        vars_ = read_trace(trc)[1]
-        eqv = lambda x: term_eq(vars_, *x) == unsat
-        if (n := len(src) * len(tgt)) > 0:
-            with Progress() as progress:
-                task = progress.add_task(str(n), total=n)
-                for p in [product([t], src) for t in tgt]:
-                    mtc += next((1 for x in p if eqv(x)), 0)
-                    progress.update(task, advance=len(src))
-    print(f'{b_name(fn)}: {mtc}/{len(tgt)}')
-
-
-def term_eq(v_list: List[str], t1: str, t2: str):
-    """Try to prove equivalence of two expressions.
-
-    Arguments:
-        v_list: list of variables, A U B.
-        t1: expression A
-        t2: expression B
-    """
-    t1, t2 = [tokenize(x) for x in (t1, t2)]
-    if next((x for x in Z3_SKIP_W if x in t1 + t2), False):
-        return unknown, None
-    # noinspection PyUnusedLocal
-    z3v = [Int(vr) for vr in v_list]
-    vals = [f'z3v[{i}]' for i in range(len(v_list))]
-    to_a = lambda x: to_assert(v_list, vals, x, smt=True)
-    g, f = map(to_a, [t1, t2])
-    solver = fresh_solver()
-    solver.add(Not(eval(g) == eval(f)))
-    return solver.check()
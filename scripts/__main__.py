@@ -1,41 +1,73 @@
 import argparse
+from importlib import import_module
 
-from . import csv_to_trace, trace_to_csv, \
-    check, generate, stats, score, match
+# action → (module, function); modules are imported only when used
+ACTIONS = {'trace': ('.', 'csv_to_trace'),
+           'csv': ('.', 'trace_to_csv'),
+           'check': ('.smt', 'check'),
+           'gen': ('.synth', 'generate'),
+           'stats': ('.report', 'stats'),
+           'score': ('.report', 'score'),
+           'match': ('.smt', 'match'),
+           'agg': ('.report', 'aggregate'),
+           'bench': ('.bench', 'bench'),
+           'run': ('.schedule', 'run'),
+           'mutate': ('.mutation', 'perturb')}
+
+# action → its options
+OPTIONS = {'gen': ['n', 'seed'],
+           'bench': ['tool', 'size', 'reps', 'warmup', 'log', 'timeout'],
+           'run': ['jobs', 'timeout', 'kinds', 'dopt'],
+           'mutate': ['seed', 'delta']}
+
+
+def load(action):
+    """Import the function of an action."""
+    module, fun = ACTIONS[action]
+    return getattr(import_module(module, 'scripts'), fun)
 
 
 def main():
-    # noinspection PyPep8Naming
-    TRACE, CSV, CHECK, GEN, STATS, SCORE, MATCH = options = \
-        'trace,csv,check,gen,stats,score,match'.split(',')
     parser = argparse.ArgumentParser(
         prog="utils", description="Helpful operations")
     parser.add_argument(
         'file', help="the file on which to operate")
     parser.add_argument(
         '-a', '--action',
-        choices=options,
+        choices=list(ACTIONS),
         action='store',
         dest='action',
         help='action to perform on file'
     )
+    parser.add_argument(
+        '-n', type=int, help='gen: number of rows')
+    parser.add_argument(
+        '--seed', type=int, help='gen, mutate: random seed')
+    parser.add_argument(
+        '--tool', default='', help='bench: tool name')
+    parser.add_argument(
+        '--size', default=0, help='bench: input size')
+    parser.add_argument(
+        '--reps', type=int, default=1, help='bench: repetitions')
+    parser.add_argument(
+        '--warmup', type=int, default=0, help='bench: warmup runs')
+    parser.add_argument(
+        '--log', help='bench: log file')
+    parser.add_argument(
+        '--timeout', type=int, default=0, help='bench, run: timeout (s)')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=0, help='run: concurrent jobs')
+    parser.add_argument(
+        '--kinds', default='dig,digup', help='run: dig and/or digup')
+    parser.add_argument(
+        '--dopt', default='', help='run: extra Dig options')
+    parser.add_argument(
+        '--delta', type=int, default=1, help='mutate: perturbation size')
     args = parser.parse_args()
-    if args.action == TRACE:
-        csv_to_trace(args.file)
-    elif args.action == CSV:
-        trace_to_csv(args.file)
-    elif args.action == CHECK:
-        check(args.file)
-    elif args.action == GEN:
-        generate(args.file)
-    elif args.action == STATS:
-        stats(args.file)
-    elif args.action == SCORE:
-        score(args.file)
-    elif args.action == MATCH:
-        match(args.file)
-    else:
+    if args.action not in ACTIONS:
         raise Exception('Unknown action')
+    opts = {k: getattr(args, k) for k in OPTIONS.get(args.action, [])}
+    load(args.action)(args.file, **opts)
 
 
 if __name__ == '__main__':
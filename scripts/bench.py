@@ -0,0 +1,101 @@
+"""Resource-measuring benchmark runs, for the times experiment.
+
+A command runs in a shell, after warmup runs, for a number of
+repetitions. Every repetition prints one row:
+
+    TOOL,SIZE,START,END,WALL,USER,SYS,RSS,REP,CODE
+
+where START and END are epoch milliseconds, WALL, USER and SYS are the
+wall-clock and CPU times in milliseconds, and RSS is the peak resident
+set size in KB, of the command and its descendants (from `wait4`).
+The first five columns are those of the earlier `timer.sh` rows.
+
+Linux accounts the memory of this process to the child until exec,
+so RSS is at least that of this process (≈30 MB). The address space
+of the command is capped at MEM_MB; a run out of memory has exit code
+MEM_CODE.
+"""
+import os
+import signal
+import sys
+import time
+from datetime import datetime
+from threading import Timer
+
+from .env import *
+from .memory import MEM_CODE, oom, shell
+
+
+def __kill(pgid):
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def __stderr(log, at):
+    """Text appended to a log since an offset."""
+    if not log:
+        return ''
+    with open(log, 'r', errors='replace') as fp:
+        fp.seek(at)
+        return fp.read()
+
+
+def run(cmd, log=None, timeout=0):
+    """Run a shell command once and measure its resources.
+
+    Arguments:
+        cmd: shell command; its stdout is discarded.
+        log: file to append stderr and a run entry to.
+        timeout: seconds until the command is killed (0 = none).
+
+    Returns:
+        Start and end time (ms), wall, user and system time (ms),
+        peak RSS (KB), and exit code (129 on timeout, MEM_CODE out of
+        memory).
+    """
+    with open(log or os.devnull, 'a') as err:
+        at = err.tell()  # stderr of this run follows
+        start, t0 = int(time.time() * 1000), time.perf_counter()
+        pid = os.posix_spawnp(
+            'sh', ['sh', '-c', shell(cmd)], os.environ, setsid=True,
+            file_actions=[
+                (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0),
+                (os.POSIX_SPAWN_DUP2, err.fileno(), 2)])
+        kill = Timer(timeout, __kill, [pid]) if timeout else None
+        kill.start() if kill else None
+        _, status, ru = os.wait4(pid, 0)
+        wall = time.perf_counter() - t0
+        kill.cancel() if kill else None
+    code = 129 if kill and wall >= timeout \
+        else os.waitstatus_to_exitcode(status)
+    if code and code != 129 and oom(code, __stderr(log, at)):
+        code = MEM_CODE
+    if log:
+        with open(log, 'a') as fp:
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            fp.write(f'{now} ({int(wall)} s) {code} {cmd}\n----\n')
+    rss = ru.ru_maxrss // (1024 if sys.platform == 'darwin' else 1)
+    ms = lambda t: round(t * 1000)
+    return (start, start + ms(wall), ms(wall), ms(ru.ru_utime),
+            ms(ru.ru_stime), rss, code)
+
+
+def bench(cmd, tool='', size=0, reps=1, warmup=0, log=None, timeout=0):
+    """Benchmark a command and print one row per repetition.
+
+    Arguments:
+        cmd: shell command.
+        tool: tool name, first column.
+        size: input size, second column.
+        reps: measured repetitions.
+        warmup: unmeasured runs before the repetitions.
+        log: file to append stderr and run entries to.
+        timeout: seconds until a run is killed (0 = none).
+    """
+    for _ in range(warmup):
+        run(cmd, log, timeout)
+    for rep in range(reps):
+        row = [tool, size, *run(cmd, log, timeout)]
+        print(','.join(map(str, row[:-1] + [rep, row[-1]])), flush=True)
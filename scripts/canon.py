@@ -0,0 +1,106 @@
+import ast
+from collections import defaultdict
+from functools import lru_cache, reduce
+from math import gcd
+from typing import Dict, Optional, Tuple
+
+from .env import *
+from .predicate import parse
+
+Mono = Tuple[Tuple[str, int], ...]  # monomial, e.g. ((x, 2), (y, 1))
+Poly = Dict[Mono, int]  # monomial → coefficient
+MAX_EXP = 16  # largest expanded power
+
+
+def __add(p: Poly, q: Poly, k: int = 1) -> Poly:
+    r = defaultdict(int, p)
+    for m, c in q.items():
+        r[m] += k * c
+    return {m: c for m, c in r.items() if c}
+
+
+def __mul(p: Poly, q: Poly) -> Poly:
+    r = defaultdict(int)
+    for (m1, c1), (m2, c2) in [(a, b) for a in p.items() for b in q.items()]:
+        exps = defaultdict(int, m1)
+        for v, e in m2:
+            exps[v] += e
+        r[tuple(sorted(exps.items()))] += c1 * c2
+    return {m: c for m, c in r.items() if c}
+
+
+def __poly(node) -> Poly:
+    """Expand an arithmetic expression into a polynomial.
+
+    Raises:
+        ValueError: if the expression is not a polynomial with
+            integer coefficients.
+    """
+    if isinstance(node, ast.Name):
+        return {((node.id, 1),): 1}
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        return {(): node.value} if node.value else {}
+    if isinstance(node, ast.UnaryOp) and \
+            isinstance(node.op, (ast.USub, ast.UAdd)):
+        k = -1 if isinstance(node.op, ast.USub) else 1
+        return __add({}, __poly(node.operand), k)
+    if isinstance(node, ast.BinOp):
+        lhs, op = __poly(node.left), node.op
+        if isinstance(op, ast.Pow):
+            exp = __poly(node.right)
+            if set(exp) - {()} or not 0 <= exp.get((), 0) <= MAX_EXP:
+                raise ValueError('exponent')
+            return reduce(__mul, [lhs] * exp.get((), 0), {(): 1})
+        rhs = __poly(node.right)
+        if isinstance(op, (ast.Add, ast.Sub)):
+            return __add(lhs, rhs, 1 if isinstance(op, ast.Add) else -1)
+        if isinstance(op, ast.Mult):
+            return __mul(lhs, rhs)
+    raise ValueError(ast.dump(node))
+
+
+@lru_cache(maxsize=None)
+def canonical(pred: P) -> Optional[tuple]:
+    """Canonical form of a polynomial (in)equality over integers.
+
+    The predicate is rewritten to `p == 0` or `p <= 0`, where p is an
+    expanded polynomial with sorted terms. Equalities are divided by
+    the gcd of their coefficients and have a positive leading term;
+    inequalities are divided by the gcd of the non-constant terms,
+    and the constant is rounded (tightened) for integer values.
+
+    Arguments:
+        pred: a (Python-compatible) invariant.
+
+    Returns:
+        A hashable canonical form, or None if the predicate cannot be
+        parsed. Other than polynomial (in)equalities, e.g., with `%`,
+        min or max, are represented by their syntax tree.
+    """
+    try:
+        node = parse(pred)
+    except SyntaxError:
+        return None
+    try:
+        if not isinstance(node, ast.Compare) or len(node.ops) != 1:
+            raise ValueError('comparison')
+        op, lhs, rhs = node.ops[0], node.left, node.comparators[0]
+        if isinstance(op, (ast.GtE, ast.Gt)):
+            lhs, rhs = rhs, lhs
+        p = __add(__poly(lhs), __poly(rhs), -1)
+    except ValueError:
+        return 'ast', ast.dump(node)
+    if isinstance(op, (ast.Lt, ast.Gt)):  # p < 0 ⟺ p + 1 <= 0
+        p = __add(p, {(): 1})
+    if isinstance(op, ast.Eq):
+        g = reduce(gcd, p.values(), 0) or 1
+        g = g if next(iter(sorted(p.items())), (0, 1))[1] > 0 else -g
+        return '==', tuple(sorted((m, c // g) for m, c in p.items()))
+    if isinstance(op, (ast.LtE, ast.GtE, ast.Lt, ast.Gt)):
+        const = p.pop((), 0)
+        if not (g := reduce(gcd, p.values(), 0)):
+            return '<=', const <= 0
+        p = {m: c // g for m, c in p.items()}
+        p[()] = -(-const // g)  # ⌈const / g⌉
+        return '<=', tuple(sorted((m, c) for m, c in p.items() if c))
+    return 'ast', ast.dump(node)
@@ -0,0 +1,124 @@
+"""Binary columnar cache of DIG traces.
+
+Each trace is converted once into a column-major `.npy` file, with a
+JSON header of its variable names, location label and value type, and
+is afterwards memory-mapped instead of parsed. Entries are keyed by
+the source path, size, mtime and value type, so editing a trace (or
+changing T_DTYPE) converts it again. The conversion reads the trace
+in blocks of rows, and loading maps the file read-only, so traces
+need not fit in memory.
+"""
+import hashlib
+import json
+from os.path import abspath, basename, join
+from pathlib import Path
+
+import numpy as np
+
+from .env import *
+
+CHUNK = 1 << 16  # rows per block
+
+
+def __header(path: str):
+    import pandas as pd
+    df = pd.read_csv(path, sep=T_SEP, nrows=0)
+    idx_slice, variables, loc = [], [], df.columns[0]
+    for i, c in enumerate(df.columns[1:]):
+        if not c.lower().startswith('unnamed:'):
+            if c2 := str(c).strip().replace(T_PREFIX, ''):
+                idx_slice.append(i + 1)
+                variables.append(c2)
+    return idx_slice, variables, loc
+
+
+def blocks(path: str):
+    """Read a DIG trace in blocks of rows.
+
+    Returns:
+        Variable names, location label, and a generator of values.
+    """
+    import pandas as pd
+    idx, variables, loc = __header(path)
+    reader = pd.read_csv(path, sep=T_SEP, chunksize=CHUNK)
+    values = (np.array(df.values[:, idx], dtype=T_DTYPE) for df in reader)
+    return variables, loc, values
+
+
+def parse(path: str):
+    """Read a DIG trace into memory."""
+    variables, loc, values = blocks(path)
+    data = list(values) or [np.empty((0, len(variables)), T_DTYPE)]
+    return np.concatenate(data), variables, loc
+
+
+def key(path: str) -> str:
+    """Identify a trace by its path, size, mtime and value type."""
+    st = os.stat(path)
+    src = f'{abspath(path)}:{st.st_size}:{st.st_mtime_ns}:' \
+          f'{np.dtype(T_DTYPE).str}'
+    return hashlib.sha256(src.encode()).hexdigest()[:16]
+
+
+def convert(path: str, fp: str):
+    """Write a DIG trace to a column-major .npy file, block by block.
+
+    Rows are first appended to a flat file, since the row count is
+    known only at the end, and then copied to the column layout.
+
+    Returns:
+        Variable names and location label.
+    """
+    variables, loc, values = blocks(path)
+    n, dtype, raw = 0, np.dtype(T_DTYPE), f'{fp}.{os.getpid()}.raw'
+    with open(raw, 'wb') as f:
+        for block in values:
+            block.tofile(f)
+            n += len(block)
+    try:
+        shape = (n, len(variables))
+        src = np.memmap(raw, dtype, 'r', shape=shape) if n \
+            else np.empty(shape, dtype)
+        tmp = f'{fp}.{os.getpid()}.npy'
+        out = np.lib.format.open_memmap(
+            tmp, 'w+', dtype, shape, fortran_order=True)
+        for i in range(0, n, CHUNK):
+            out[i:i + CHUNK] = src[i:i + CHUNK]
+        out.flush()
+        del out, src
+        os.replace(tmp, fp)
+    finally:
+        Path(raw).unlink(missing_ok=True)
+    return variables, loc
+
+
+def load(path: str, root: str = T_CACHE):
+    """Memory-map a DIG trace, converting it first if necessary.
+
+    Arguments:
+        path: a DIG trace (CSV).
+        root: cache directory.
+
+    Returns:
+        Trace values (read-only), variable names, location label.
+    """
+    name = f'{basename(path)}-{np.dtype(T_DTYPE).name}'
+    base = join(root, f'{name}-{key(path)}')
+    try:
+        with open(f'{base}.json') as f:
+            head = json.load(f)
+    except (OSError, ValueError):
+        Path(root).mkdir(parents=True, exist_ok=True)
+        variables, loc = convert(path, f'{base}.npy')
+        head = {'vars': variables, 'loc': loc, 'source': path,
+                'dtype': np.dtype(T_DTYPE).str}
+        tmp = f'{base}.{os.getpid()}.json'
+        with open(tmp, 'w') as f:
+            json.dump(head, f)
+        os.replace(tmp, f'{base}.json')
+        for old in Path(root).glob(f'{name}-{"?" * 16}.json'):  # stale
+            if old != Path(f'{base}.json'):
+                old.unlink(missing_ok=True)
+                old.with_suffix('.npy').unlink(missing_ok=True)
+    data = np.asarray(np.load(f'{base}.npy', mmap_mode='r'))
+    return data, head['vars'], head['loc']
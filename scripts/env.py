@@ -7,18 +7,42 @@ import numpy as np
 ENV = {'T_DTYPE': np.int64, 'Z3_TO': 60, 'C_SEP': ',',
        'IN_DIR': 'input/traces', 'F_CONFIG': 'inputs.yaml',
        'N_VAR': 5, 'TMP': '.tmp', 'STO': 60, 'TO': 600,
+       'N_PARTS': 0, 'N_ROWS': 0, 'JOBS': 1, 'WARM': 0,
+       'W_JOBS': 50, 'W_MEM': 1024,
+       'ARGS_F': 'config.txt', 'CACHE': '.cache', 'CACHE_MB': 256,
+       'T_CACHE': '.traces', 'STREAM': 1, 'PROFILE': '', 'PRE': 1,
+       'SMT_CACHE': '.smt.db', 'QUEUE': '', 'LEASE': 30,
+       'MEM_MB': 0, 'MEM_LOW': 512,
        'T_FMT': 1,  # 1=MS, 1000=S
        **os.environ}
 
 # Config files
 F_CONFIG = ENV['F_CONFIG']
+ARGS_F = ENV['ARGS_F']
 IN_DIR = ENV['IN_DIR']
 TMP = ENV['TMP']
+CACHE = ENV['CACHE']  # empty to disable
+T_CACHE = ENV['T_CACHE']  # binary traces; empty to disable
+SMT_CACHE = ENV['SMT_CACHE']  # SMT verdicts; empty to disable
+PROFILE = ENV['PROFILE']  # DigUp trace-event file; empty to disable
+QUEUE = ENV['QUEUE']  # DigUp work-queue directory; empty to disable
 
 # Runtime configs
 PICK_N = int(ENV['N_VAR'])
+N_PARTS = int(ENV['N_PARTS'])  # 0=all, else cap with pair coverage
+N_ROWS = int(ENV['N_ROWS'])  # 0=all, else row sample size
 SPROC_TO = int(ENV['STO'])
 TOTAL_TO = int(ENV['TO'])
+N_JOBS = int(ENV['JOBS'])
+WARM = bool(int(ENV['WARM']))
+W_JOBS = int(ENV['W_JOBS'])  # recycle warm worker after N jobs
+W_MEM = int(ENV['W_MEM'])  # …or after peak RSS growth of N MB
+STREAM = bool(int(ENV['STREAM']))  # pass partitions to Dig w/o files
+PRE = int(ENV['PRE'])  # DigUp drops 1=constant, duplicate 2=+affine cols
+LEASE = int(ENV['LEASE'])  # seconds a work-queue claim is valid
+MEM_MB = int(ENV['MEM_MB'])  # address-space cap per Dig process; 0=none
+MEM_LOW = int(ENV['MEM_LOW'])  # MB available below which Dig jobs wait
+CACHE_MB = int(ENV['CACHE_MB'])
 T_FMT = int(ENV['T_FMT'])
 Z3_SKIP_W = 'log,sin,cos,tan'.split(',')
 Z3_TO = ENV['Z3_TO']
@@ -0,0 +1,91 @@
+"""Exact evaluation of invariants on traces, with NumPy.
+
+A predicate is compiled once into a function over trace columns, and
+evaluated on all rows at once. Integer traces are evaluated exactly:
+columns switch to Python integers where products could overflow, and
+predicates with division or fractional values are left to the solver.
+"""
+from functools import lru_cache, reduce
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .env import *
+from .predicate import function
+
+# Python builtins of Dig invariants, as NumPy element-wise functions
+NP_SCOPE = {'__builtins__': {},
+            'min': lambda *vs: reduce(np.minimum, vs),
+            'max': lambda *vs: reduce(np.maximum, vs)}
+
+# magnitude above which integer products may overflow int64
+NP_SAFE = 2 ** 20
+
+
+@lru_cache(maxsize=4096)
+def compile_pred(pred: P, var: Tuple[str, ...]):
+    """Compile a predicate into a function over trace columns.
+
+    Arguments:
+        pred: a (Python-compatible) invariant, e.g. `x - y <= 0`.
+        var: names of the trace columns, in order.
+
+    Returns:
+        A function that takes one array per variable and returns
+        the element-wise truth value of the predicate.
+    """
+    return function(pred, var, NP_SCOPE)
+
+
+def as_int(data) -> Optional[np.ndarray]:
+    """Integer representation of a trace, or None if fractional."""
+    data = np.asarray(data)
+    if data.dtype.kind in 'iuO':
+        return data
+    if not np.all(np.isfinite(data) & (data == np.round(data))):
+        return None
+    if len(data) and np.abs(data).max() >= 2 ** 62:
+        return np.vectorize(int, otypes=[object])(data)
+    return data.astype(np.int64)
+
+
+def violations(pred: P, var: List[str], data) -> Optional[np.ndarray]:
+    """Find the rows of a trace where a predicate does not hold.
+
+    Arguments:
+        pred: a (Python-compatible) invariant.
+        var: variable names.
+        data: trace values, one column per variable.
+
+    Returns:
+        Indices of violating rows, or None if the predicate cannot
+        be evaluated exactly (symbolic functions, division, or
+        fractional values).
+    """
+    if '/' in pred or (data := as_int(data)) is None:
+        return None
+    try:
+        return np.flatnonzero(~holds(pred, var, data))
+    except Exception:
+        return None
+
+
+def holds(pred: P, var: List[str], data) -> np.ndarray:
+    """Evaluate a predicate on every row of a trace.
+
+    Integer columns are evaluated as Python integers when the
+    predicate has powers or the values are large, to avoid overflow.
+
+    Raises:
+        Exception: if the predicate cannot be evaluated on arrays.
+
+    Returns:
+        Boolean array, true for the rows where the predicate holds.
+    """
+    data = np.asarray(data)
+    if data.dtype.kind in 'iu' and len(data) and \
+            ('**' in pred or np.abs(data).max() > NP_SAFE):
+        data = data.astype(object)
+    with np.errstate(all='ignore'):
+        res = compile_pred(pred, tuple(var))(*data.T)
+    return np.broadcast_to(np.asarray(res, dtype=bool), (len(data),))
@@ -0,0 +1,87 @@
+"""Memory limits and admission control of Dig processes.
+
+Dig processes started by DigUp and by the experiment runner get an
+address-space cap of MEM_MB (0 = none) with the shell's `ulimit -v`
+(a `preexec_fn` is unsafe in a threaded parent), so that a large
+partition fails alone, instead of pushing the node into swap or the
+OOM killer. A job starts only while the system has MEM_LOW MB of
+memory available, or if no other job is running; under pressure,
+jobs wait, which scales the concurrency down until memory frees up.
+
+A process that runs out of memory reports a MemoryError (or bad_alloc)
+on stderr, or, under the cap, may die of an abort or a kill; `oom`
+tells these from other failures, and such jobs are recorded with exit
+code MEM_CODE, apart from timeouts (129). Callers rule out the kills
+of their own timeouts first.
+"""
+import signal
+from threading import Condition
+
+from .env import *
+
+MEM_CODE = 137  # exit code of a job out of memory (128 + SIGKILL)
+POLL = 0.5  # seconds between checks of the available memory
+
+
+def available_mb() -> float:
+    """Memory available to new processes (MB), without swapping."""
+    try:
+        with open('/proc/meminfo', 'r') as fp:
+            for line in fp:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return os.sysconf('SC_AVPHYS_PAGES') * \
+        os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+
+
+def capped(argv: list, mb=MEM_MB) -> list:
+    """A command that caps its address space, then execs argv (in the
+    same process, so that it can be killed by its pid)."""
+    return ['sh', '-c', f'ulimit -v {mb * 1024} && exec "$@"', 'sh',
+            *argv] if mb > 0 else argv
+
+
+def shell(cmd: str, mb=MEM_MB) -> str:
+    """A shell command that caps its address space, then runs cmd."""
+    return f'ulimit -v {mb * 1024}; {cmd}' if mb > 0 else cmd
+
+
+def oom(code, err: str = '', mb=MEM_MB) -> bool:
+    """Whether a process ran out of memory, by its standard error, or
+    by a signal exit (or that of a shell running it) under a cap.
+
+    Arguments:
+        code: exit code, not of a kill by the caller.
+        err: standard error of the process.
+        mb: address-space cap of the process (MB), 0 for none.
+    """
+    sigs = (signal.SIGKILL, signal.SIGABRT)
+    return 'MemoryError' in err or 'bad_alloc' in err or mb > 0 and \
+        code in [*(-s for s in sigs), *(128 + s for s in sigs)]
+
+
+class Admission:
+    """Gate of concurrent jobs under memory pressure.
+
+    A job enters when at least `low` MB are available, or when no other
+    job is running, so that a queue never stalls.
+
+    Arguments:
+        low: available memory (MB) below which jobs wait.
+    """
+
+    def __init__(self, low=MEM_LOW):
+        self.low, self.running, self.cond = low, 0, Condition()
+
+    def __enter__(self):
+        with self.cond:
+            while self.running and available_mb() < self.low:
+                self.cond.wait(POLL)
+            self.running += 1
+
+    def __exit__(self, *_):
+        with self.cond:
+            self.running -= 1
+            self.cond.notify()
@@ -0,0 +1,151 @@
+"""Invariant-preserving trace mutation (verified/mutation.dfy).
+
+`ControlledMutation` of an original trace o by a mutated trace m:
+
+    1. immutable columns keep their values of o (EnsureImmVector);
+    2. a row keeps its mutated values only if all mutable predicates
+       hold for it, else it reverts to the row of o (EnsureMutVector).
+
+`mutate` applies both steps to all rows at once, with NumPy boolean
+masks; `vect_mutation` follows the Dafny functions row by row, and
+`main` checks one against the other on random cases.
+
+Usage:
+    python -m scripts -a mutate RESULT [--seed S] [--delta D]
+    python -m scripts.mutation                  (check against spec)
+"""
+import ast
+import sys
+from typing import Optional, Sequence
+
+import numpy as np
+
+from . import read_trace, input_csv, b_name, parse_dig_result
+from . import construct_trace
+from .env import *
+from .evaluate import holds
+from .predicate import parse
+
+
+def __holds(pred, var, data):
+    """Rows where a predicate holds; none if it cannot be evaluated."""
+    try:
+        return holds(pred, var, data)
+    except Exception:
+        return np.zeros(len(data), dtype=bool)
+
+
+def mutate(o, m, mut: Sequence[P], imm: Sequence[int], var: List[str]):
+    """Controlled mutation of a trace, for all rows at once.
+
+    Arguments:
+        o: original trace; the mutable predicates hold on its rows.
+        m: mutated trace, of the same shape.
+        mut: mutable predicates, over the variables.
+        imm: indices of the immutable columns.
+        var: variable names, one per column.
+
+    Returns:
+        The trace of `VectMutation` of every row of o and m.
+    """
+    o, m = np.asarray(o), np.asarray(m)
+    if o.shape != m.shape:
+        raise ValueError(f'shapes differ: {o.shape} and {m.shape}')
+    out = np.array(m, dtype=np.result_type(o, m))
+    out[:, list(imm)] = o[:, list(imm)]
+    changed = np.flatnonzero((out != o).any(axis=1))
+    keep = changed
+    for p in mut:
+        keep = keep[__holds(p, var, out[keep])]
+    back = np.setdiff1d(changed, keep, assume_unique=True)
+    out[back] = o[back]
+    return out
+
+
+def vect_mutation(o, m, mut, imm, var):
+    """VectMutation of one row, as in the Dafny specification."""
+    ir = [o[i] if i in imm else m[i] for i in range(len(o))]
+    row = np.array([ir])
+    correct = all(__holds(p, var, row)[0] for p in mut)
+    return ir if correct else list(o)
+
+
+def __constant(pred, var) -> Optional[str]:
+    """The variable of a predicate `x == c` or `x - c == 0`, if any."""
+    num = lambda n: isinstance(n, ast.Constant) or isinstance(
+        n, ast.UnaryOp) and isinstance(n.op, ast.USub) and num(n.operand)
+    name = lambda n: n.id if isinstance(n, ast.Name) and n.id in var \
+        else name(n.left) if isinstance(n, ast.BinOp) and isinstance(
+            n.op, (ast.Add, ast.Sub)) and num(n.right) else None
+    try:
+        tree = parse(pred)
+    except SyntaxError:
+        return None
+    if not isinstance(tree, ast.Compare) or len(tree.ops) != 1 or \
+            not isinstance(tree.ops[0], ast.Eq):
+        return None
+    left, right = tree.left, tree.comparators[0]
+    return name(left) if num(right) else name(right) if num(left) else None
+
+
+def mutables(invs, var):
+    """Immutable columns (with a constant invariant) and the mutable
+    predicates, of the invariants of a Dig result."""
+    const = {p: v for p in invs if (v := __constant(p, var))}
+    imm = sorted({var.index(v) for v in const.values()})
+    return [p for p in invs if p not in const], imm
+
+
+def perturb(fn, seed=None, delta=1):
+    """Print a mutation of the trace of a Dig result that preserves
+    its invariants.
+
+    Every value is perturbed by a random integer in [-delta, delta].
+
+    Arguments:
+        fn: path to a Dig result.
+        seed: random seed.
+        delta: largest perturbation.
+    """
+    o, var, _ = read_trace(input_csv(b_name(fn)))
+    mut, imm = mutables(parse_dig_result(fn), var)
+    rng = np.random.default_rng(seed)
+    m = o + rng.integers(-delta, delta, o.shape, endpoint=True)
+    construct_trace(var, mutate(o, m, mut, imm, var))
+
+
+def __case(rng, rows, cols):
+    """Random original and mutated traces, immutables and predicates
+    that hold on the original trace."""
+    var = [f'x{i}' for i in range(cols)]
+    o = rng.integers(-9, 10, (rows, cols))
+    m = np.where(rng.random((rows, cols)) < .5, o,
+                 o + rng.integers(-3, 4, (rows, cols)))
+    imm = sorted(rng.choice(cols, rng.integers(0, cols), replace=False))
+    mut = []
+    for _ in range(rng.integers(0, 4)):
+        i, j = rng.choice(cols, 2, replace=False)
+        d = (o[:, i] - o[:, j]).max()
+        mut.append(f'x{i} - x{j} <= {d}')
+    return o, m, mut, imm, var
+
+
+def main(n=1000, seed=0):
+    # tests of verified/muttest.dfy
+    x = [[-2, 1, 4, 7, -3], [11, 2, -7, 5, 3]]
+    y = [[-3, 2, 5, 8, -4], [10, 6, -5, 4, 2]]
+    e = [[-2, 2, 5, 7, -3], [11, 2, -7, 5, 3]]
+    var = [f'x{i}' for i in range(5)]
+    cases = [(np.array(x), np.array(y), ['x1 <= x3'], [0, 3, 4], var)]
+    assert mutate(*cases[0]).tolist() == e
+    rng = np.random.default_rng(seed)
+    cases += [__case(rng, rng.integers(1, 20), rng.integers(2, 7))
+              for _ in range(n)]
+    for o, m, mut, imm, var in cases:
+        spec = [vect_mutation(a, b, mut, imm, var) for a, b in zip(o, m)]
+        assert mutate(o, m, mut, imm, var).tolist() == spec, (mut, imm)
+    print(f'{len(cases)} cases agree with the specification')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
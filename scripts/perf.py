@@ -0,0 +1,174 @@
+"""Micro-benchmarks of the hot paths of the helper scripts and DigUp.
+
+Every benchmark runs on the traces in `input/traces` and the results
+in `logs`, offline. A benchmark is timed with `timeit` as the best of
+REPEAT rounds, of as many calls as take at least 0.2 s, and compared
+with a JSON baseline; it regresses if it is slower than the baseline
+by more than the threshold.
+
+`eval_tokens` and `eval_ast` evaluate the same predicates on the same
+rows, parsed from scratch per call: by value substitution into the
+tokenized string and `eval` per row, as before `scripts.predicate`,
+and by one compiled callable per predicate.
+
+Usage:
+    python -m scripts.perf [-t THRESHOLD] [-b BASELINE] [--save] [NAME…]
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import timeit
+from contextlib import redirect_stdout
+from glob import glob
+from os import devnull
+from os.path import isfile, join
+
+from . import read_trace, tokenize, to_assert, dig_p, read_lines
+from . import construct_trace, parse_dig_result, columnar
+from .env import *
+
+BASELINE = 'perf.json'
+THRESHOLD = 0.25  # relative slowdown that counts as a regression
+REPEAT = 5
+LOGS = 'logs'
+TRACE = join(IN_DIR, 'ds_wred.csv')  # largest input trace
+PY_SCOPE = {'__builtins__': {}, 'min': min, 'max': max}
+RESULTS = ['ds_blink', 'ds_iris', 'ds_wine', 'f_2x3y', 'l_133']
+
+
+def __results():
+    """Representative results, their invariants and traces."""
+    out = []
+    for name in RESULTS:
+        if isfile(fn := join(LOGS, f'{name}.dig')):
+            out.append((fn, parse_dig_result(fn),
+                        *read_trace(join(IN_DIR, f'{name}.csv'))[:2]))
+    return out
+
+
+def __evaluable(results):
+    """Predicates of the results with the rows of their traces, for
+    the predicates that evaluate by both string and compiled paths."""
+    from .predicate import function
+    cases = []
+    for _, ps, data, vrs in results:
+        rows = data[:20].tolist()
+        for p in ps[:10]:
+            try:
+                eval(to_assert(vrs, rows[0], tokenize(p)), dict(PY_SCOPE))
+                function(p, vrs, dict(PY_SCOPE))(*rows[0])
+            except Exception:
+                continue
+            cases.append((vrs, p, rows))
+    return cases
+
+
+def benchmarks(null):
+    """Benchmark name → function of no arguments.
+
+    Arguments:
+        null: writable file that discards the output of benchmarks.
+    """
+    from digup.plan import plan
+    from .predicate import function, cache_clear
+    from .smt import check, match, term_eq, verdicts
+    memo = verdicts()
+    memo.close()  # time the solver: in-memory verdicts, cleared per call
+    results = __results()
+    invs = [p for _, ps, _, _ in results for p in ps]
+    lines = [ln for f in glob(join(LOGS, '*.dig*')) for ln in read_lines(f)]
+    values, vars_, _ = read_trace(TRACE)
+    asserts = [(vrs, row, tokenize(p)) for _, ps, data, vrs in results
+               for p in ps[:10] for row in data[:20].tolist()]
+    pairs = [(vrs, p, q) for _, ps, _, vrs in results
+             for p, q in zip(ps, ps[1:])][:20]
+    digups = sorted(glob(join(LOGS, 'ds_*.digup')))[:2]
+    cases = __evaluable(results)
+
+    def tokenize_all():
+        tokenize.cache_clear()
+        [tokenize(p) for p in invs]
+
+    def quiet(fun, files):
+        memo.mem.clear()
+        with redirect_stdout(null):
+            [fun(f) for f in files]
+
+    def eval_tokens():
+        tokenize.cache_clear()
+        for vrs, p, rows in cases:
+            tokens = tokenize(p)
+            [eval(to_assert(vrs, row, tokens), dict(PY_SCOPE))
+             for row in rows]
+
+    def eval_ast():
+        cache_clear()
+        for vrs, p, rows in cases:
+            fn = function(p, vrs, dict(PY_SCOPE))
+            [fn(*row) for row in rows]
+
+    def term_eq_all():
+        memo.mem.clear()
+        [term_eq(*pair) for pair in pairs]
+
+    return {
+        'tokenize': tokenize_all,
+        'to_assert': lambda: [to_assert(*a) for a in asserts],
+        'eval_tokens': eval_tokens,
+        'eval_ast': eval_ast,
+        'dig_p': lambda: dig_p(lines),
+        'read_trace': lambda: read_trace(TRACE),
+        'parse_trace': lambda: columnar.parse(TRACE),
+        'construct_trace': lambda: construct_trace(
+            vars_, values, io.StringIO()),
+        'plan': lambda: [plan(n, 5, 4) for n in (13, 16)],
+        'term_eq': term_eq_all,
+        'check': lambda: quiet(check, [f for f, *_ in results]),
+        'match': lambda: quiet(match, digups)}
+
+
+def measure(fun):
+    """Best time of a call (s)."""
+    timer = timeit.Timer(fun)
+    number = timer.autorange()[0]
+    return min(timer.repeat(REPEAT, number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='perf', description='Micro-benchmarks of the hot paths')
+    parser.add_argument('names', nargs='*', help='benchmarks to run')
+    parser.add_argument('-b', '--baseline', default=BASELINE)
+    parser.add_argument('-t', '--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--save', action='store_true',
+                        help='save the times as the new baseline')
+    args = parser.parse_args()
+    base = {}
+    if isfile(args.baseline):
+        with open(args.baseline, 'r') as fp:
+            base = json.load(fp)['times']
+    times, fails = {}, 0
+    with open(devnull, 'w') as null:
+        for name, fun in benchmarks(null).items():
+            if args.names and name not in args.names:
+                continue
+            times[name] = t = measure(fun)
+            ref = base.get(name)
+            slow = ref is not None and t > ref * (1 + args.threshold)
+            fails += slow
+            diff = f'{t / ref - 1:>+7.1%}' if ref else ' ' * 7
+            print(f'{name:<16}{t * 1e3:>10.3f} ms {diff}  '
+                  f'{"SLOWER" if slow else "ok"}', flush=True)
+    if args.save or not base:
+        with open(args.baseline, 'w') as fp:
+            json.dump({'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'times': {**base, **times}}, fp, indent=2)
+        print(f'saved baseline to {args.baseline}')
+    sys.exit(1 if fails else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Predicates parsed once into a shared syntax tree.
+
+Dig invariants are Python expressions, so they are parsed by Python's
+own parser (`ast`), which reads the text in a single pass in C; a
+lexer of our own would still need a parser for precedence and calls,
+and would be slower in pure Python. Each predicate is parsed once,
+and compiled once per variable order into a callable that evaluates
+with Python numbers, NumPy arrays or Z3 terms, depending on its
+arguments and scope, without substituting values into strings.
+"""
+import ast
+from collections import Counter
+from copy import deepcopy
+from functools import lru_cache
+from typing import Tuple
+
+from .env import *
+
+
+@lru_cache(maxsize=None)
+def parse(pred: P) -> ast.expr:
+    """Parse a (Python-compatible) predicate, once.
+
+    Raises:
+        SyntaxError: if the predicate is not a Python expression.
+    """
+    return ast.parse(pred.strip(), mode='eval').body
+
+
+class __Where(ast.NodeTransformer):
+    """Rewrite `a if c else b` to `where(c, a, b)`."""
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        args = [node.test, node.body, node.orelse]
+        return ast.Call(ast.Name('where', ast.Load()), args, [])
+
+
+@lru_cache(maxsize=None)
+def __code(pred: P, var: Tuple[str, ...], where: bool):
+    params = ast.arguments(
+        posonlyargs=[], args=[ast.arg(v) for v in var], kwonlyargs=[],
+        kw_defaults=[], defaults=[])
+    body = __Where().visit(deepcopy(parse(pred))) if where else parse(pred)
+    tree = ast.Expression(ast.Lambda(params, body))
+    return compile(ast.fix_missing_locations(tree), pred, 'eval')
+
+
+def function(pred: P, var: List[str], scope: dict, where=False):
+    """Build a callable of a predicate over its variables.
+
+    The same predicate yields a Python, NumPy or Z3 evaluator,
+    depending on the scope its functions (min, max, …) come from
+    and on the values it is called with.
+
+    Arguments:
+        pred: a (Python-compatible) predicate.
+        var: variable names, in order of the arguments.
+        scope: global names available to the predicate.
+        where: evaluate conditional expressions by the function
+            `where` of the scope, e.g., element-wise on arrays.
+
+    Returns:
+        A function that takes one value per variable.
+    """
+    return eval(__code(pred, tuple(var), where), scope)
+
+
+@lru_cache(maxsize=None)
+def names(pred: P) -> frozenset:
+    """All names that occur in a predicate."""
+    return frozenset(n.id for n in ast.walk(parse(pred))
+                     if isinstance(n, ast.Name))
+
+
+@lru_cache(maxsize=None)
+def features(pred: P) -> Counter:
+    """Count the operators and functions of a predicate."""
+    ops = Counter()
+    for n in ast.walk(parse(pred)):
+        if isinstance(n, ast.Compare):
+            ops.update(type(op).__name__ for op in n.ops)
+        elif isinstance(n, ast.BinOp):
+            ops[type(n.op).__name__] += 1
+        elif isinstance(n, ast.Call) and isinstance(n.func, ast.Name):
+            ops[n.func.id] += 1
+    return ops
+
+
+def cache_clear():
+    """Drop all parsed and compiled predicates."""
+    for f in (parse, __code, names, features):
+        f.cache_clear()
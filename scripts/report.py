@@ -0,0 +1,199 @@
+"""Tables of trace statistics and analysis results."""
+from collections import Counter
+from itertools import product
+from os import listdir
+from os.path import isfile, join
+from typing import Tuple
+
+import numpy as np
+from prettytable import PrettyTable as PrettyT
+
+from . import read_yaml, input_csv, b_name, is_ds, as_list, c_vars
+from . import lmap, dict_rev, parse_times, parse_dig_result, read_trace
+from .env import *
+from .predicate import features
+from .store import ResultStore, file_key, DB_NAME
+
+
+# noinspection PyPep8Naming
+def stats(dir_path):
+    """Display statistics about a directory."""
+    is_trace = lambda f: f.endswith(".csv") and '_' in f
+    if files := list(filter(is_trace, listdir(dir_path))):
+        # traces stats
+        pt = Counter([f.split('_', 1)[0] for f in files])
+        pt['∑'] = sum(pt.values())
+        T1 = PrettyT(list(pt.keys()), title='Traces by kind')
+        T1.add_row(list(pt.values()))
+
+        # variable frequencies
+        vl = [len(read_trace(join(dir_path, f))[1]) for f in files]
+        scope = [(x, 0) for x in range(min(vl), max(vl) + 1)]
+        dct = {**dict(scope), **Counter(vl), ' ∑ ': sum(vl)}
+        T2 = PrettyT(lmap(str, dct.keys()))
+        T2.title = 'Variable counts (frequency)'
+        T2.add_row(list(dct.values()))
+
+        # datasets
+        fmap = lambda f: map(len, read_trace(join(dir_path, f))[:2])
+        vals = lambda f: list(reversed(list(fmap(f))))
+        data = [[b_name(f)] + vals(f) for f in filter(is_ds, files)]
+        T3 = PrettyT(['Name', 'V', 'N'], title='Datasets', align='l')
+        T3.add_rows(sorted(data))
+
+        # invariant configurations
+        cf = read_yaml(F_CONFIG)
+        fft = lambda f: f.replace(' ', '')
+        kfm = lambda l: ','.join(sorted(l))
+        rfm = lambda x: fft(x) if x.startswith('[') else f'={x}'
+        formulae = [fft(x['formula']) for x in cf.values()]
+        rng = [[kfm(k) + rfm(r) for r, k in dict_rev(vin).items()]
+               for vin in [op['vin'] or {} for op in cf.values()]]
+        T4 = PrettyT(title='Invariant benchmarks')
+        T4.add_column('Name', list(cf), align='l')
+        T4.add_column('V', lmap(len, lmap(c_vars, cf.values())))
+        T4.add_column('N', [x['n'] for x in cf.values()])
+        T4.add_column('Formula', formulae, align='l')
+        T4.add_column('Ranges', [' '.join(x) for x in rng], align='l')
+
+        print('\n\n'.join(map(str, [T1, T2, T3, T4])))
+
+
+def score_row(fp: str, src: str, goal) -> Tuple[list, List[P]]:
+    """Statistics of a results file for the score table.
+
+    Arguments:
+        fp: path to results file.
+        src: path to the input trace.
+        goal: known invariant(s), or None for datasets.
+
+    Returns:
+        The table row and the parsed invariants.
+    """
+    name, ext = b_name(fp), fp.rsplit('.', 1)[-1]
+    res = parse_dig_result(fp)
+    vrs = read_trace(src)[1]
+    row = [ext, name, len(vrs), len(res)]
+    stats_ = np.array([np.zeros(4)])
+    if len(res):
+        stats_ = np.array([[
+            1 if ops['Eq'] else 0,
+            1 if ops['LtE'] else 0,
+            ops['Mod'],
+            ops['min'] + ops['max']]
+            for ops in map(features, res)])
+    row += np.sum(stats_, axis=0).astype(int).tolist()
+
+    if goal is not None:
+        from .smt import term_eq, unsat, unknown
+        mtc, resp = False, '✗'
+        pool = list(product(as_list(goal), res))
+        while pool and not mtc:
+            ans = term_eq(vrs, *pool.pop())
+            mtc = ans == unsat
+            resp = '?' if ans == unknown else resp
+        row.append('✔' if mtc else resp)
+    return row, res
+
+
+def score_keys(dir_path, files, conf):
+    """Store keys of results files: content, input trace and goal."""
+    goal = lambda f: None if is_ds(f) else conf[b_name(f)]['goal']
+    return [file_key(join(dir_path, f), input_csv(b_name(f)),
+                     goal(f), Z3_TO) for f in files]
+
+
+# noinspection PyPep8Naming
+def score(dir_path):
+    """Score analysis results at `dir_path`.
+
+    Rows of unchanged results files are read from the results store
+    in `dir_path`, other files are parsed and scored.
+    """
+    digs = lambda f: f.endswith(".dig") or f.endswith(".digup")
+    is_t = lambda f: f.endswith(".time")
+    files = list(filter(digs, listdir(dir_path)))
+    srcs = [input_csv(b_name(f)) for f in files]
+    conf = read_yaml(F_CONFIG)
+    base_h = 'Detector,Benchmark,V,I,=,≤,%,↕'.split(',')
+    T1, T2, T3, T4 = PrettyT(base_h + ['✔']), PrettyT(base_h), None, None
+
+    with ResultStore(join(dir_path, DB_NAME)) as db:
+        for f, s in sorted([x for x in zip(files, srcs) if isfile(x[1])]):
+            key = score_keys(dir_path, [f], conf)[0]
+            if (row := db.row(key)) is None:
+                goal = None if is_ds(f) else conf[b_name(f)]['goal']
+                row, res = score_row(join(dir_path, f), s, goal)
+                db.put(key, b_name(f), row[0], row, res)
+            (T2 if is_ds(f) else T1).add_row(row)
+
+    if times := list(filter(is_t, listdir(dir_path))):
+        sec_f = lambda t: round(float(t) / T_FMT, 1)
+        t_fmt = lambda t: (int(t) if T_FMT <= 1 else sec_f(t))
+        res, sizes = {}, set()
+
+        for f in sorted(times):
+            rows = parse_times(join(dir_path, f))
+            res[bm := b_name(f)] = {}
+            tools = [(x, {}) for x in set([r[0] for r in rows])]
+            res[bm].update(**dict(sorted(tools, reverse=True)))
+            sizes.update(set([int(r[1]) for r in rows]))
+            for row in rows:
+                res[bm][row[0]].setdefault(int(row[1]), []).append(row)
+
+        sizes = sorted(list(sizes))
+        unit = 's' if T_FMT == 1000 else 'ms'
+        head = 'Benchmark,Detector'.split(',')
+        szh = [f'N={n}, {unit}' for n in sizes]
+        T3 = PrettyT(head + szh, align='r')
+        T4 = PrettyT(head + [f'N={n}' for n in sizes], align='r',
+                     title='CPU (user + sys, ms) and peak RSS (MB)')
+
+        for bm, val in res.items():
+            for dt, tms in val.items():
+                cell = lambda n, f: f(tms[n]) if n in tms else ''
+                wall = lambda rs: spread(
+                    [float(r[4]) for r in rs if r[4]], t_fmt)
+                T3.add_row([bm, dt.lower()] + [cell(n, wall) for n in sizes])
+                T4.add_row([bm, dt.lower()] + [
+                    cell(n, resources) for n in sizes])
+        T4 = T4 if any(len(r) > 7 for f in times for r in
+                       parse_times(join(dir_path, f))) else None
+
+    for x in [T1, T2, T3, T4]:
+        for i in [0, 1]:
+            if x:
+                x.align[x.field_names[i]] = 'l'
+    print('\n\n'.join(map(str, filter(lambda x: x, [T1, T2, T3, T4]))))
+
+
+def spread(values, fmt=int) -> str:
+    """Median of repeated measurements, ± half their interquartile range."""
+    if not values:
+        return ''
+    if len(values) == 1:
+        return str(fmt(values[0]))
+    q1, med, q3 = np.percentile(values, [25, 50, 75])
+    return f'{fmt(med)} ±{fmt((q3 - q1) / 2)}'
+
+
+def resources(rows) -> str:
+    """Median CPU time and peak RSS of timed runs (bench rows)."""
+    rows = [r for r in rows if len(r) > 7]
+    if not rows:
+        return ''
+    cpu = np.median([int(r[5]) + int(r[6]) for r in rows])
+    return f'{int(cpu)} / {max(int(r[7]) for r in rows) // 1024}'
+
+
+def aggregate(dir_path):
+    """Display per-detector totals of results scored at `dir_path`."""
+    digs = lambda f: f.endswith(".dig") or f.endswith(".digup")
+    files = list(filter(digs, listdir(dir_path)))
+    keys = score_keys(dir_path, files, read_yaml(F_CONFIG))
+    with ResultStore(join(dir_path, DB_NAME)) as db:
+        rows = db.aggregates(keys)
+    table = PrettyT('Detector,Files,V,I,=,≤,%,↕'.split(','))
+    table.add_rows(rows)
+    table.align['Detector'] = 'l'
+    print(table)
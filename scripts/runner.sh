@@ -10,16 +10,23 @@ cleanup() {
 }
 
 runCmdWithTimeout() {
-  (exec sh -c "$2") 2>>"$3" 1>/dev/null & pid=$!
+  err=$(mktemp)
+  # cap the address space at MEM_MB, if set
+  ([ "${MEM_MB:-0}" -gt 0 ] && ulimit -v $((MEM_MB * 1024))
+   exec sh -c "$2") 2>"$err" 1>/dev/null & pid=$!
   (sleep "$1" && kill -9 $pid) 2>/dev/null & watcher=$!
-  if wait $pid || ex=$? >/dev/null; then
-    pkill -P $watcher
+  wait $pid; ex=$?
+  if pkill -P $watcher; then
     wait $watcher
-    cleanup
-    echo $((ex))
+    # out of memory: MEM_CODE of scripts/memory.py
+    grep -qE 'MemoryError|bad_alloc' "$err" && ex=137
   else
-    cleanup
-    echo 129; fi
+    ex=129
+  fi
+  cat "$err" >> "$3"
+  rm -f "$err"
+  cleanup
+  echo $((ex))
 }
 
 start_time=$SECONDS
@@ -0,0 +1,155 @@
+"""Parallel scheduler of the Dig and DigUp experiments.
+
+Every job runs in its own process group, so that a timeout kills the
+job and its children only. Jobs run longest-first, by their runtimes
+in earlier logs, and jobs with existing outputs are skipped, so an
+interrupted run resumes where it stopped. Runs are recorded in
+`_log.txt` like `runner.sh` does. Jobs have their address space
+capped at MEM_MB and wait to start while memory is low; jobs out of
+memory are recorded with exit code MEM_CODE, apart from timeouts.
+"""
+import re
+import shlex
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from os import cpu_count, environ
+from os.path import join, basename, isfile
+from pathlib import Path
+from threading import Event, Lock
+
+from . import b_name, is_ds, dig_args
+from .env import *
+from .memory import Admission, MEM_CODE, oom, shell
+
+LOG_F = '_log.txt'
+HISTORY = [join('logs', LOG_F)]  # earlier runs, besides the output log
+PYTHON = shlex.quote(sys.executable)  # interpreter of the runner
+DIG_CMD = PYTHON + ' -O dig/src/dig.py {} -log 0 -noss -nomp -noarrays {}'
+DIGUP_CMD = PYTHON + ' -m digup {} -j {} -log 0 -noss -nomp -noarrays {}'
+ENTRY = re.compile(r'^\S+ \S+ \((\d+) s\) -?\d+ .*> (\S+)\s*$')
+
+__live, __lock, __halted = set(), Lock(), Event()
+__gate = Admission()
+
+
+def history(logs):
+    """Last runtime (s) per output file name in runner logs."""
+    times = {}
+    for log in filter(isfile, logs):
+        with open(log, 'r') as fp:
+            for line in fp:
+                if m := ENTRY.match(line):
+                    times[basename(m.group(2))] = int(m.group(1))
+    return times
+
+
+def matrix(out_dir, kinds, timeout, dopt=''):
+    """The benchmark matrix: (output, command, env, follow-up) per job."""
+    traces = sorted(Path(IN_DIR).glob('*.csv'))
+    quote = lambda f: map(shlex.quote, dig_args(b_name(f)))
+    args = lambda f: ' '.join([dopt, *quote(f)])
+    todo = []
+    for f in traces:
+        if 'dig' in kinds:
+            out = join(out_dir, f'{f.stem}.dig')
+            todo.append((out, DIG_CMD.format(f, args(f)), {}, None))
+        if 'digup' in kinds and is_ds(f.name):
+            out = join(out_dir, f'{f.stem}.digup')
+            env = {'TO': str(max(timeout - 1, 1))}
+            cmd = DIGUP_CMD.format(f, N_JOBS, dopt)
+            todo.append((out, cmd, env, f'{PYTHON} -m digup {out}'))
+    return todo
+
+
+def __kill(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def __run(out, cmd, env, post, log, timeout):
+    """Run one job in a new process group, with timeout and memory cap."""
+    start, code, part = time.time(), 0, f'{out}.part'
+    if __halted.is_set():
+        return out, None
+    with __gate, open(part, 'w') as fp, tempfile.TemporaryFile('w+') as err:
+        with subprocess.Popen(
+                shell(cmd), shell=True, stdout=fp, stderr=err,
+                env={**environ, **env}, start_new_session=True) as proc:
+            with __lock:
+                __live.add(proc)
+            try:
+                code = proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                __kill(proc)
+                proc.wait()
+                code = 129
+            finally:
+                with __lock:
+                    __live.discard(proc)
+        err.seek(0)
+        text = err.read()
+    if code not in (0, 129) and oom(code, text):
+        code = MEM_CODE
+    if __halted.is_set():
+        os.remove(part)
+        return out, None
+    os.replace(part, out)
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with __lock, open(log, 'a') as fp:
+        fp.write(text)
+        fp.write(f'{now} ({int(time.time() - start)} s) {code} '
+                 f'{cmd} > {out}\n----\n')
+    if post:
+        subprocess.run(post, shell=True)
+    return out, code
+
+
+def __halt(*_):
+    """Kill running jobs and exit."""
+    __halted.set()
+    with __lock:
+        for proc in __live:
+            __kill(proc)
+    sys.exit(129)
+
+
+def run(out_dir, jobs=0, timeout=0, kinds='dig,digup', dopt=''):
+    """Run the experiments concurrently.
+
+    Arguments:
+        out_dir: results directory.
+        jobs: concurrent jobs (0 = number of cores).
+        timeout: seconds per job (0 = TO).
+        kinds: comma-separated kinds of jobs, `dig` and/or `digup`.
+        dopt: extra Dig options.
+    """
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    log, kinds = join(out_dir, LOG_F), kinds.split(',')
+    timeout = timeout or TOTAL_TO
+    todo = [j for j in matrix(out_dir, kinds, timeout, dopt)
+            if not isfile(j[0])]
+    for part in Path(out_dir).glob('*.part'):
+        part.unlink()
+    est = history(HISTORY + [log])
+    longest = max(est.values(), default=0)
+    todo.sort(key=lambda j: est.get(basename(j[0]), longest), reverse=True)
+    signal.signal(signal.SIGINT, __halt)
+    signal.signal(signal.SIGTERM, __halt)
+    codes = Counter()
+    with ThreadPoolExecutor(max_workers=jobs or cpu_count()) as pool:
+        futures = [pool.submit(__run, *j, log, timeout) for j in todo]
+        for future in as_completed(futures):
+            out, code = future.result()
+            codes[code] += 1
+            print(f'{code:>3} {out}', flush=True) if code is not None \
+                else None
+    print(f'{codes[129]} timed out, {codes[MEM_CODE]} out of memory',
+          file=sys.stderr)
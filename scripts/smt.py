@@ -0,0 +1,202 @@
+"""SMT-based checks of invariants: validity on traces and equivalence."""
+from functools import reduce
+# noinspection PyUnresolvedReferences
+from math import *
+from os.path import isfile
+
+import numpy as np
+from prettytable import PrettyTable as PrettyT
+from rich.progress import Progress
+from z3 import *
+
+from . import input_csv, b_name, parse_dig_result, read_trace
+from . import tokenize, to_assert
+from .canon import canonical
+from .env import *
+from .evaluate import violations
+from .predicate import function, names
+from .smtcache import Verdicts, query_key, rename
+
+VERDICT = {'sat': sat, 'unsat': unsat, 'unknown': unknown}
+__verdicts = []
+
+
+def fresh_solver(sol=None):
+    solver = sol or Solver()
+    solver.reset() if sol else None
+    solver.set("timeout", Z3_TO)
+    return solver
+
+
+def verdicts() -> Verdicts:
+    """The SMT verdict cache of this process."""
+    if not __verdicts:
+        __verdicts.append(Verdicts())
+    return __verdicts[0]
+
+
+def __data_key(values) -> bytes:
+    values = np.ascontiguousarray(values)
+    return values.tobytes() + str(values.shape).encode() \
+        if values.dtype.kind != 'O' else str(values.tolist()).encode()
+
+
+def sym_min(*vs):
+    """Python min evaluation for Z3."""
+    return reduce(lambda x, m: If(x < m, x, m), vs[1:], vs[0])
+
+
+def sym_max(*vs):
+    """Python max evaluation for Z3."""
+    return reduce(lambda x, m: If(x > m, x, m), vs[1:], vs[0])
+
+
+def smt_scope():
+    """Names available to predicates evaluated for Z3."""
+    return {**globals(), 'min': sym_min, 'max': sym_max}
+
+
+def smt_check(solver, var: List[str], values, pred: P):
+    """Check a predicate holds for all values, using an SMT solver.
+
+    The instances of the predicate, one per row of values, are
+    asserted in one scope of the solver, each guarded by an assumption
+    literal. Failing rows are found from the unsat cores, by retracting
+    the failing assumption and solving again.
+
+    Arguments:
+        solver: an SMT solver.
+        var: variable names.
+        values: rows of values.
+        pred: a (Python-compatible) predicate.
+
+    Returns:
+        The solver result and a string of (at most 3) failing
+        assertions, if any.
+    """
+    fn, pool, fail = function(pred, var, smt_scope()), {}, []
+    solver.push()
+    for i, val in enumerate(values.tolist()):
+        try:
+            term = fn(*val)
+        except z3types.Z3Exception:
+            continue  # '⚠ symbolic'
+        if isinstance(term, bool):  # decided without solver
+            fail += [] if term else [i]
+        else:
+            solver.add(Implies(mark := Bool(f'row_{i}'), term))
+            pool[mark] = i
+    fail = sorted(fail, reverse=True)[:3]
+    while (sc := solver.check(*pool)) == unsat and len(fail) < 3:
+        if not (core := solver.unsat_core()):
+            break
+        fail.append(i := max(pool[m] for m in core))
+        pool = {m: j for m, j in pool.items() if j != i}
+    solver.pop()
+    lit = lambda i: to_assert(var, values[i], tokenize(pred, TOKENS))
+    cex = ', '.join(lit(i) for i in sorted(fail, reverse=True))
+    return (unsat if fail else sc), cex
+
+
+def check(fn: str) -> bool:
+    """Sanity check to confirm DIG invariants are valid on a trace.
+
+    Checks that DIG invariants are valid for the input data. Displays,
+    at stdout, the evaluation result for every invariant. Invariants
+    over integer values are evaluated with NumPy; fractional values
+    and symbolic invariants are checked with Z3.
+
+    Arguments:
+        fn (str): path to the DIG results file to check.
+
+    Returns:
+        True if all invariants are satisfactory.
+    """
+    src = input_csv(b_name(fn))
+    predicates = parse_dig_result(fn)
+    data, var = read_trace(src)[:2]
+    solver, all_t, rows = None, True, []
+    for p in predicates:
+        idx, occ = zip(*[c for c in enumerate(var) if c[1] in names(p)])
+        values = np.unique(data[:, idx], axis=0)
+        if (bad := violations(p, occ, values)) is not None:
+            pred, sc = tokenize(p, TOKENS), unsat if len(bad) else sat
+            cex = ', '.join(to_assert(occ, values[i], pred)
+                            for i in bad[::-1][:3])
+        else:
+            key = query_key('check', get_version_string(), p, occ,
+                            T_DTYPE, __data_key(values))
+            if hit := verdicts().get(key, int(Z3_TO)):
+                sc, cex = VERDICT[hit[0]], hit[1]
+            else:
+                solver = solver or fresh_solver()
+                sc, cex = smt_check(solver, occ, values, p)
+                verdicts().put(key, sc, Z3_TO, cex)
+        all_t = all_t and sc != unsat
+        rows.append([p, sc, cex])
+    table = PrettyT(["P(…)", "eval(P)", "CEX"])
+    table.add_rows(rows)
+    print(table)
+    return all_t
+
+
+def match(fn):
+    """Count matching invariants between Dig and DigUp.
+
+    Invariants with equal canonical forms match without a solver.
+    The remaining pairs are checked with Z3, but only if they have the
+    same variables and relation type.
+
+    Arguments:
+        fn: DigUp results file
+    """
+    fc = fn.replace('.digup', '.dig')
+    trc, mtc, tgt = input_csv(b_name(fn)), 0, []
+    n_idx, n_smt, n_q = 0, 0, 0
+    if fn.endswith(".digup") and all(map(isfile, [fn, fc, trc])):
+        src, tgt = map(parse_dig_result, [fn, fc])
+        vars_ = read_trace(trc)[1]
+        sig = lambda t: (names(t) & frozenset(vars_),
+                         '%' in t, '==' in t)
+        index, groups = set(map(canonical, src)) - {None}, {}
+        for s in src:
+            groups.setdefault(sig(s), []).append(s)
+        with Progress() as progress:
+            task = progress.add_task(str(len(tgt)), total=len(tgt))
+            for t in tgt:
+                if canonical(t) in index:
+                    n_idx += 1
+                else:
+                    for s in groups.get(sig(t), []):
+                        n_q += 1
+                        if term_eq(vars_, t, s) == unsat:
+                            n_smt += 1
+                            break
+                progress.update(task, advance=1)
+        mtc = n_idx + n_smt
+    print(f'{b_name(fn)}: {mtc}/{len(tgt)} '
+          f'(index: {n_idx}, smt: {n_smt} in {n_q} queries)')
+
+
+def term_eq(v_list: List[str], t1: str, t2: str):
+    """Try to prove equivalence of two expressions.
+
+    Verdicts are memoized by the query with variables renamed.
+
+    Arguments:
+        v_list: list of variables, A U B.
+        t1: expression A
+        t2: expression B
+    """
+    if next((x for x in Z3_SKIP_W if x in tokenize(t1) + tokenize(t2)),
+            False):
+        return unknown, None
+    key = query_key('eq', get_version_string(), *rename(v_list, t1, t2))
+    if hit := verdicts().get(key, int(Z3_TO)):
+        return VERDICT[hit[0]]
+    z3v, scope = [Int(vr) for vr in v_list], smt_scope()
+    g, f = [function(t, v_list, scope)(*z3v) for t in (t1, t2)]
+    solver = fresh_solver()
+    solver.add(Not(g == f))
+    verdicts().put(key, res := solver.check(), Z3_TO)
+    return res
@@ -0,0 +1,107 @@
+"""Memoized SMT verdicts, in process and on disk.
+
+Queries are keyed by a hash of their kind, the Z3 version, and their
+terms with the variables renamed in order of occurrence, so that the
+same question over other variable names hits the same entry. Verdicts
+`sat` and `unsat` hold for any timeout; `unknown` is reused only for
+timeouts up to the one it was recorded with, so that a longer timeout
+asks the solver again.
+
+The on-disk store (SMT_CACHE, empty to disable) is an SQLite file,
+shared by `check`, `match` and `score` across runs and by concurrent
+processes: it is write-ahead logged and every verdict is committed on
+its own, so that writers hold the lock only briefly and a killed
+process keeps the verdicts it found.
+"""
+import atexit
+import hashlib
+import re
+import sqlite3
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Tuple
+
+from .env import *
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    key TEXT PRIMARY KEY, verdict TEXT, timeout INTEGER, info TEXT);
+"""
+
+
+def rename(var: List[str], *terms: str) -> List[str]:
+    """Rename the variables of terms to v0, v1, … in order of occurrence."""
+    pattern = re.compile(r'(?<![\w.])(' + '|'.join(
+        map(re.escape, sorted(var, key=len, reverse=True))) + r')(?![\w.])')
+    names = {}
+    sub = lambda m: names.setdefault(m.group(1), f'v{len(names)}')
+    return [pattern.sub(sub, t) if var else t for t in terms]
+
+
+def query_key(kind: str, *parts) -> str:
+    """Hash of a query."""
+    h = hashlib.sha256(kind.encode())
+    for p in parts:
+        h.update(b'\0' + (p if isinstance(p, bytes) else str(p).encode()))
+    return h.hexdigest()
+
+
+class Verdicts:
+    """LRU map of query keys to verdicts, backed by an SQLite file.
+
+    Arguments:
+        path: database file, or empty for memory only.
+        size: number of entries kept in memory.
+    """
+
+    def __init__(self, path=SMT_CACHE, size=1 << 14):
+        self.mem, self.size, self.lock = OrderedDict(), size, Lock()
+        self.hits = self.misses = 0
+        self.db = sqlite3.connect(
+            path, timeout=60, isolation_level=None,
+            check_same_thread=False) if path else None
+        if self.db:
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.executescript(SCHEMA)
+            atexit.register(self.close)
+
+    def get(self, key: str, timeout: int) -> Optional[Tuple[str, str]]:
+        """Verdict and info of a query, if known for the timeout."""
+        with self.lock:
+            if (res := self.mem.get(key)) is None and self.db:
+                res = self.db.execute(
+                    'SELECT verdict, timeout, info FROM verdicts '
+                    'WHERE key = ?', (key,)).fetchone()
+            if res is None or res[0] == 'unknown' and res[1] < timeout:
+                self.misses += 1
+                return None
+            self.mem[key] = res
+            self.mem.move_to_end(key)
+            self.hits += 1
+            return res[0], res[2]
+
+    def put(self, key: str, verdict, timeout: int, info: str = ''):
+        """Record the verdict of a query."""
+        res = (str(verdict), int(timeout), info or '')
+        with self.lock:
+            self.mem[key] = res
+            self.mem.move_to_end(key)
+            while len(self.mem) > self.size:
+                self.mem.popitem(last=False)
+            if self.db:
+                try:
+                    self.db.execute(
+                        'INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)',
+                        (key, *res))
+                except sqlite3.OperationalError:
+                    pass  # busy for longer than the timeout: memory only
+
+    def close(self):
+        with self.lock:
+            if self.db:
+                self.db.close()
+                self.db = None
+
+    def __str__(self):
+        return f'SMT cache: {self.hits} hits, {self.misses} misses'
@@ -0,0 +1,50 @@
+"""Import-time budget of the utility actions and DigUp.
+
+Each target is imported in a fresh interpreter with `-X importtime`.
+The check fails if a target exceeds its budget, or if it imports a
+heavy module that it does not need, e.g., `-a csv` importing Z3.
+
+Usage:
+    python -m scripts.startup
+"""
+import subprocess
+import sys
+
+# target → (import statement, budget in ms, modules it must not import)
+LIGHT = ['z3', 'pandas', 'prettytable', 'rich']
+TABLE = ['z3', 'pandas', 'rich']
+TARGETS = {
+    **{a: (f"from scripts.__main__ import load; load('{a}')", 150, LIGHT)
+       for a in ['trace', 'csv', 'gen', 'bench', 'run']},
+    **{a: (f"from scripts.__main__ import load; load('{a}')", 200, TABLE)
+       for a in ['stats', 'score', 'agg', 'mutate']},
+    **{a: (f"from scripts.__main__ import load; load('{a}')", 250, ['pandas'])
+       for a in ['check', 'match']},
+    'digup': ('import digup.__main__', 200, ['z3', 'pandas', 'prettytable'])}
+
+
+def importtime(stmt):
+    """Total import time (ms) and names of the modules imported by stmt."""
+    cmd = [sys.executable, '-X', 'importtime', '-c', stmt]
+    log = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    rows = [ln.split('|') for ln in log.stderr.splitlines()
+            if ln.startswith('import time:') and ln[12:].strip()[0].isdigit()]
+    total = sum(int(r[1]) for r in rows if not r[2].startswith('  '))
+    return total / 1000, {r[2].strip() for r in rows}
+
+
+def main():
+    base = importtime('pass')[1]
+    fails = 0
+    for name, (stmt, budget, avoid) in TARGETS.items():
+        ms, mods = importtime(stmt)
+        bad = [m for m in avoid if m in mods - base]
+        ok = ms <= budget and not bad
+        fails += 0 if ok else 1
+        print(f'{name:<8}{ms:>7.1f} / {budget} ms  '
+              f'{"ok" if ok else "FAIL"}  {", ".join(bad)}'.rstrip())
+    sys.exit(1 if fails else 0)
+
+
+if __name__ == '__main__':
+    main()
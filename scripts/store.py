@@ -0,0 +1,84 @@
+import hashlib
+import json
+import sqlite3
+from os.path import getsize, getmtime, isfile
+from typing import Optional
+
+from .env import *
+
+DB_NAME = '_score.db'
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    key TEXT PRIMARY KEY, name TEXT, detector TEXT, row TEXT);
+CREATE TABLE IF NOT EXISTS invariants (
+    key TEXT, n INTEGER, pred TEXT, PRIMARY KEY (key, n));
+"""
+
+
+def file_key(path: str, *deps) -> str:
+    """Hash of a file's content and of its dependencies.
+
+    Arguments:
+        path: a results file.
+        deps: other values the derived results depend on; paths to
+            existing files are represented by size and mtime.
+    """
+    h = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        h.update(fp.read())
+    for d in deps:
+        d = f'{getsize(d)}:{getmtime(d)}' \
+            if isinstance(d, str) and isfile(d) else str(d)
+        h.update(d.encode() + b'\0')
+    return h.hexdigest()
+
+
+class ResultStore:
+    """Persistent store of parsed results and their score rows.
+
+    Arguments:
+        path: database file.
+    """
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.db.commit()
+        self.db.close()
+
+    def row(self, key: str) -> Optional[list]:
+        """Score row of a results file, if stored."""
+        res = self.db.execute(
+            'SELECT row FROM files WHERE key = ?', (key,)).fetchone()
+        return json.loads(res[0]) if res else None
+
+    def put(self, key: str, name: str, detector: str,
+            row: list, preds: List[str]):
+        """Store the score row and invariants of a results file."""
+        self.db.execute('DELETE FROM invariants WHERE key = ?', (key,))
+        self.db.execute(
+            'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+            (key, name, detector, json.dumps(row, ensure_ascii=False)))
+        self.db.executemany(
+            'INSERT INTO invariants VALUES (?, ?, ?)',
+            [(key, n, p) for n, p in enumerate(preds)])
+
+    def aggregates(self, keys: List[str]):
+        """Per-detector totals: files, variables, invariants, and
+        counts of =, ≤, %, ↕."""
+        marks = ','.join('?' * len(keys))
+        rows = self.db.execute(
+            f'SELECT detector, row FROM files WHERE key IN ({marks})',
+            keys).fetchall()
+        totals = {}
+        for det, row in rows:
+            vals = json.loads(row)[2:8]
+            acc = totals.setdefault(det, [0] * 7)
+            totals[det] = [acc[0] + 1] + [
+                a + v for a, v in zip(acc[1:], vals)]
+        return sorted([d] + t for d, t in totals.items())
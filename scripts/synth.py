@@ -0,0 +1,136 @@
+"""Generate traces of the invariant benchmarks (inputs.yaml).
+
+The `expr` of a benchmark is evaluated on whole columns of random
+inputs with NumPy, so traces of millions of rows are generated in
+blocks and written as they are produced. Expressions that cannot be
+evaluated on arrays are evaluated row by row. Both are reproducible
+by seed.
+"""
+import random
+import sys
+from argparse import Namespace
+from functools import reduce
+# noinspection PyUnresolvedReferences
+from math import *
+from random import randint
+
+import numpy as np
+
+from . import read_yaml, as_list, c_vars, lmap
+from .env import *
+from .predicate import function
+
+CHUNK = 1 << 16  # rows per block
+
+
+def rand_data(in_v, ranges, expr, has_o) -> List[T_DTYPE]:
+    """Calculate value of a function for random inputs.
+
+    Given an expression with variables,
+        1. Choose random value for each variable.
+        2. Substitute all variables in expression with values.
+        3. Evaluate the expression to get output value.
+
+    Arguments:
+        in_v: input variables that occur in expr.
+        ranges: (min, max) of each variable.
+        expr: literal (str) of a function to evaluate.
+        has_o: true if evaluation returns values
+
+    Raises:
+        Exception: if `expr` contains variables not in `in_vars`
+            or other expressions outside the Python math stdlib.
+
+    Returns:
+        A row of data, of selected inputs and the calculated output.
+    """
+    dt_v = lambda nx: randint(*nx) if isinstance(nx, list) else nx
+    data = lmap(dt_v, ranges)
+    fn = function(expr, in_v, globals())
+    res = as_list(fn(*data)) if has_o else []
+    return data + res
+
+
+def np_scope(rng, m):
+    """Functions of benchmark expressions, over columns of m rows."""
+    span = lambda lo, hi: np.asarray(hi - lo + 1, dtype=np.float64)
+    return {'__builtins__': {'abs': abs, 'zip': zip, 'range': range},
+            'randint': lambda lo, hi: lo + np.floor(
+                rng.random(m) * span(lo, hi)).astype(np.int64),
+            'min': lambda *vs: reduce(np.minimum, vs),
+            'max': lambda *vs: reduce(np.maximum, vs),
+            'where': np.where, 'log': np.log, 'sin': np.sin,
+            'cos': np.cos, 'tan': np.tan}
+
+
+def rand_block(in_v, ranges, expr, n_out, rng, m):
+    """Calculate the value of a function for m random inputs at once.
+
+    Integer columns are evaluated as Python integers if the expression
+    has powers, that could overflow int64.
+
+    Returns:
+        A list of columns, of selected inputs and calculated outputs.
+    """
+    col = lambda r: rng.integers(r[0], r[1], m, endpoint=True) \
+        if isinstance(r, list) else np.full(m, r)
+    data = lmap(col, ranges)
+    args = [d.astype(object) for d in data] if '**' in expr else data
+    res = []
+    if n_out:
+        with np.errstate(all='ignore'):
+            res = function(expr, in_v, np_scope(rng, m), where=True)(*args)
+        res = list(res) if isinstance(res, (tuple, list)) else [res]
+        res = [np.broadcast_to(r, (m,)) for r in res]
+        if len(res) != n_out:
+            raise ValueError(f'{len(res)} outputs, expected {n_out}')
+    return data + res
+
+
+def fmt_col(col) -> List[str]:
+    """Format a column, integral values without a fraction."""
+    if col.dtype.kind in 'iub':
+        return col.astype(np.int64).astype(str).tolist()
+    if col.dtype.kind == 'f' and np.all(np.isfinite(col)) and \
+            np.all(col == np.round(col)) and np.abs(col).max() < 2 ** 62:
+        return col.astype(np.int64).astype(str).tolist()
+    fmt = lambda v: str(int(v)) if isinstance(v, float) and \
+        v.is_integer() else str(v)
+    return lmap(fmt, col.tolist())
+
+
+def write_rows(fp, cols):
+    """Write columns as rows of a DIG trace."""
+    cols = [[T_LABEL] * len(cols[0])] + lmap(fmt_col, cols)
+    fp.write(''.join(T_SEP.join(row) + '\n' for row in zip(*cols)))
+
+
+def generate(f_name, n=None, seed=None, fp=sys.stdout):
+    """Generate random function traces based on configuration.
+
+    Arguments:
+        f_name: benchmark name in inputs.yaml.
+        n: number of rows; default is the `n` of the benchmark.
+        seed: random seed, for reproducible traces.
+        fp: output stream.
+    """
+    if f_name not in (conf := read_yaml(F_CONFIG)):
+        raise Exception(f'No generator known for {f_name}!')
+    fun = Namespace(**conf[f_name])
+    fin = fun.vin if fun.vin else {}
+    p, n_out = fun.expr, len(as_list(fun.vo))
+    vrs, r = map(list, [fin.keys(), fin.values()])
+    n = fun.n if n is None else n
+    rng = np.random.default_rng(seed)
+    head = [T_LABEL] + [f'{T_PREFIX}{x}' for x in c_vars(conf[f_name])]
+    fp.write(T_SEP.join(head) + '\n')
+    try:
+        block = lambda m: rand_block(vrs, r, p, n_out, rng, m)
+        block(2)
+        rng = np.random.default_rng(seed)
+    except Exception:
+        random.seed(seed)
+        block = lambda m: lmap(np.array, zip(*[
+            rand_data(vrs, r, p, n_out > 0) for _ in range(m)]))
+    for i in range(0, n, CHUNK):
+        write_rows(fp, block(min(CHUNK, n - i)))